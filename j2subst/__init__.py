@@ -1,6 +1,12 @@
 ## this module
 from .dumpfmt import J2substDumpFormat
+from .frozen import (
+    J2substFrozenDict,
+    J2substFrozenList,
+)
 from .j2subst import J2subst
+from .mode import J2substMode
+from .options import J2substRenderOptions
 
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+import collections
+import hashlib
+import threading
+
+from types import (
+    CodeType,
+)
+from typing import (
+    Any,
+)
+
+## Jinja2
+import jinja2
+
+## this module
+from .partial import J2substPartial
+
+
+## compiled templates keyed by content (not by name or file name):
+## identical templates in different directories are compiled only once.
+## templates are never reloaded during run.
+class J2substTemplateCache:
+
+    def __init__(self, capacity: int):
+        ## 0 disables cache
+        self.capacity = max(0, int(capacity))
+        self.lock = threading.Lock()
+        ## (source hash, environment signature, partial evaluation generation) -> compiled code
+        self.codes: collections.OrderedDict[tuple[str, tuple[Any, ...], int], CodeType] = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    ## environment settings which affect compiled code (e.g. environment overlays with different syntax)
+    @staticmethod
+    def __signature(environment: jinja2.Environment) -> tuple[Any, ...]:
+        return (
+            environment.block_start_string,
+            environment.block_end_string,
+            environment.variable_start_string,
+            environment.variable_end_string,
+            environment.comment_start_string,
+            environment.comment_end_string,
+            environment.line_statement_prefix,
+            environment.line_comment_prefix,
+            environment.trim_blocks,
+            environment.lstrip_blocks,
+            environment.newline_sequence,
+            environment.keep_trailing_newline,
+            tuple(sorted(environment.extensions)),
+            environment.optimized,
+            environment.autoescape,
+            environment.finalize,
+            environment.is_async,
+        )
+
+    @staticmethod
+    def __compile(environment: jinja2.Environment, source: str, name: str | None, filename: str | None, partial: J2substPartial | None) -> CodeType:
+        if partial is not None:
+            return partial.compile(environment, source, name, filename)
+        return environment.compile(source, name, filename)
+
+    def compile(self, environment: jinja2.Environment, source: str, name: str | None, filename: str | None, partial: J2substPartial | None = None) -> CodeType:
+        if self.capacity == 0:
+            with self.lock:
+                self.misses += 1
+            return self.__compile(environment, source, name, filename, partial)
+
+        key = (hashlib.sha256(source.encode('utf-8')).hexdigest(), self.__signature(environment), 0 if partial is None else partial.generation)
+        with self.lock:
+            code = self.codes.get(key)
+            if code is not None:
+                self.codes.move_to_end(key)
+                self.hits += 1
+                return code
+
+        code = self.__compile(environment, source, name, filename, partial)
+
+        with self.lock:
+            self.misses += 1
+            self.codes[key] = code
+            while len(self.codes) > self.capacity:
+                self.codes.popitem(last=False)
+                self.evictions += 1
+        return code
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                'size': len(self.codes),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
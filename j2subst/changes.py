@@ -0,0 +1,149 @@
+import os
+import os.path
+import subprocess
+
+from os import (
+    PathLike,
+)
+from typing import (
+    Any,
+)
+
+## Jinja2
+import jinja2.nodes
+
+## this module
+from .functions import (
+    is_map,
+    merge_dict_recurse,
+)
+from .lazy import parse_config_documents
+
+
+class J2substGitError(ValueError):
+    pass
+
+
+## files changed in working tree (including untracked ones) since git commit "ref"
+class J2substGitChanges:
+
+    @staticmethod
+    def __git(cwd: str, *args: str) -> bytes:
+        try:
+            p = subprocess.run(['git', '-C', cwd, *args], stdin=subprocess.DEVNULL, capture_output=True, check=False)
+        except OSError as e:
+            raise J2substGitError(f'unable to run git: {e}') from e
+        if p.returncode != 0:
+            _err = p.stderr.decode('utf-8', errors='replace').strip()
+            raise J2substGitError(f'git {args[0]} failed: {_err}')
+        return p.stdout
+
+    @staticmethod
+    def __nul_list(data: bytes) -> list[str]:
+        return [ os.fsdecode(x) for x in data.split(b'\0') if x ]
+
+    def __init__(self, ref: str, cwd: str | PathLike[str] = '.'):
+        self.ref = ref
+        cwd = str(cwd)
+
+        self.toplevel = os.path.realpath(os.fsdecode(self.__git(cwd, 'rev-parse', '--show-toplevel').strip()))
+        ## verify reference early
+        self.__git(cwd, 'rev-parse', '--verify', f'{ref}^{{commit}}')
+
+        ## absolute path -> status: "A" (added), "D" (deleted), "M" (modified) etc.
+        self.files: dict[str, str] = {}
+        x = self.__nul_list(self.__git(self.toplevel, 'diff', '--name-status', '--no-renames', '-z', ref, '--'))
+        for status, name in zip(x[0::2], x[1::2]):
+            self.files[self.path(name)] = status[:1]
+        for name in self.__nul_list(self.__git(self.toplevel, 'ls-files', '--others', '--exclude-standard', '-z')):
+            self.files[self.path(name)] = 'A'
+
+        ## files known to git: changes of other files (e.g. ignored ones) are not visible
+        self.known: set[str] = set(self.files)
+        self.known.update( self.path(name) for name in self.__nul_list(self.__git(self.toplevel, 'ls-files', '-z')) )
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.toplevel, name)
+
+    ## changes of files unknown to git (e.g. ignored ones or outside of repository) are not visible
+    def is_tracked(self, path: str) -> bool:
+        return os.path.realpath(path) in self.known
+
+    def is_changed(self, path: str) -> bool:
+        return os.path.realpath(path) in self.files
+
+    ## file contents at "ref" (None if file didn't exist)
+    def old_contents(self, path: str) -> bytes | None:
+        if self.files.get(path) == 'A':
+            return None
+        return self.__git(self.toplevel, 'show', f'{self.ref}:{os.path.relpath(path, self.toplevel)}')
+
+    ## top-level keys with different values in old and current version of configuration file
+    def changed_config_keys(self, path: str) -> set[str]:
+
+        def _merged(data: bytes | None) -> dict[Any, Any]:
+            cfg: dict[Any, Any] = {}
+            if data is None:
+                return cfg
+            for x in parse_config_documents(path, data):
+                if not is_map(x):
+                    raise ValueError(f'not a mapping in config file: {path}')
+                cfg = merge_dict_recurse(cfg, x)
+            return cfg
+
+        new_data: bytes | None = None
+        if self.files.get(path) != 'D':
+            with open(path, mode='rb') as f:
+                new_data = f.read()
+
+        old, new = _merged(self.old_contents(path)), _merged(new_data)
+        return { str(k) for k in (old.keys() | new.keys()) if old.get(k) != new.get(k) }
+
+
+## top-level keys of "name" (e.g. "cfg") used by template:
+## only "name.key" and "name['key']" are recognized, any other use of "name" results in None (i.e. unknown)
+def template_config_keys(ast: jinja2.nodes.Template, name: str) -> set[str] | None:
+    keys: set[str] = set()
+
+    def _walk(node: jinja2.nodes.Node, parent: jinja2.nodes.Node | None) -> bool:
+        if isinstance(node, jinja2.nodes.Name) and (node.name == name):
+            if node.ctx != 'load':
+                ## shadowed by local variable
+                return False
+            if isinstance(parent, jinja2.nodes.Getattr) and (parent.node is node):
+                keys.add(parent.attr)
+                return True
+            if isinstance(parent, jinja2.nodes.Getitem) and (parent.node is node) and isinstance(parent.arg, jinja2.nodes.Const) and isinstance(parent.arg.value, str):
+                keys.add(parent.arg.value)
+                return True
+            return False
+
+        for c in node.iter_child_nodes():
+            if not _walk(c, node):
+                return False
+        return True
+
+    return keys if _walk(ast, None) else None
+
+
+## functions reading files (see functions.py): files are not known until template is rendered
+J2SUBST_READ_FUNCTIONS = frozenset({ 'read_file', 'read_json', 'read_toml', 'read_yaml' })
+
+
+## whether template refers to any of J2SUBST_READ_FUNCTIONS (e.g. calls or aliases it)
+def template_reads_files(ast: jinja2.nodes.Template) -> bool:
+    for node in ast.find_all(jinja2.nodes.Name):
+        if (node.ctx == 'load') and (node.name in J2SUBST_READ_FUNCTIONS):
+            return True
+    return False
+
+
+## "used" and "changed" are sets of top-level keys, None means "unknown" (i.e. any key)
+def is_config_affected(used: set[str] | None, changed: set[str] | None) -> bool:
+    if used is not None and not used:
+        return False
+    if changed is None:
+        return True
+    if not changed:
+        return False
+    return (used is None) or bool(used & changed)
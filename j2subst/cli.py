@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 
+import dataclasses
+import itertools
 import os
 
+from collections.abc import (
+    Iterable,
+)
 from typing import (
     Any,
 )
@@ -12,11 +17,14 @@ import click.core
 
 ## this module
 from .dumpfmt import J2substDumpFormat
+from .mode import J2substMode
 from .defaults import (
     J2SUBST_DICT_NAME_CFG,
     J2SUBST_DICT_NAME_ENV,
     J2SUBST_DUMP_FORMAT,
     J2SUBST_MAX_DEPTH,
+    J2SUBST_MODE,
+    J2SUBST_TEMPLATE_CACHE_SIZE,
     J2SUBST_TEMPLATE_PATH_PARTS,
     J2SUBST_TEMPLATE_PATH,
     J2SUBST_VERSION,
@@ -35,7 +43,12 @@ from .cli_help import (
     J2SUBST_CLI_HELP__ENV,
     J2SUBST_CLI_HELP__TEMPLATE_PATH,
 )
+from .filelist import open_file_list
 from .j2subst import J2subst
+from .shard import (
+    J2substShardItem,
+    parse_shard,
+)
 
 
 ## NB: click.option() with "show_envvar=True" does a somewhat horrible formatting
@@ -46,18 +59,139 @@ J2SUBST_CLI_HELP_CONFIG_PATH = '''
     Supported formats: YAML (".yaml", ".yml"), JSON (".json"), TOML (".toml").
 '''
 
+J2SUBST_CLI_HELP_CONFIG_TREE = '''
+    Colon-separated list of configuration trees in format: <key>=<directory>.
+
+    Directories become mappings and files become (string) values within "<key>".
+    Files are read on demand, Kubernetes ConfigMap/Secret volumes are supported.
+'''
+
 J2SUBST_CLI_HELP_TEMPLATE_PATH = f'''
     Colon-separated list of template directories.
 
     Default: {J2SUBST_TEMPLATE_PATH}
 '''
 
+J2SUBST_CLI_HELP_COMPILE = '''
+    Precompile templates into directory or ZIP archive (if name ends with ".zip") and exit.
+
+    Use "--precompiled" to load them later.
+'''
+
+J2SUBST_CLI_HELP_PRECOMPILED = '''
+    Directory or ZIP archive with precompiled templates (see "--compile").
+
+    Precompiled template is used only if its source is not changed.
+'''
+
+J2SUBST_CLI_HELP_PROFILE = '''
+    Configuration profile in format: <name>=<config_path>.
+
+    May be specified several times, every template is rendered against every profile.
+    Configuration from "--config-path" is common for all profiles.
+'''
+
+J2SUBST_CLI_HELP_PROFILE_OUTPUT = '''
+    Output directory for profiles, placeholder "@{PROFILE}" is replaced with profile name.
+'''
+
+J2SUBST_CLI_HELP_FREEZE = '''
+    Make configuration dictionary read-only for templates.
+
+    Templates are unable to alter data seen by other templates.
+
+    Indexes built by "index_by"/"group_by" filters are cached only for read-only configuration.
+'''
+
+J2SUBST_CLI_HELP_COMPACT = '''
+    Intern repeated strings and share equal values while loading configuration.
+
+    With "--freeze", equal subtrees are shared too.
+    Memory footprint is reported with "--verbose" or "--debug".
+'''
+
+J2SUBST_CLI_HELP_PARTIAL_EVAL = '''
+    Replace configuration/environment lookups (e.g. "cfg.app.port") with constants while compiling templates.
+
+    Requires "--freeze". Configuration is not folded with "--profile".
+'''
+
+J2SUBST_CLI_HELP_CACHE_SIZE = '''
+    Maximum number of distinct compiled templates kept in memory (0 disables cache).
+
+    Templates are cached by their contents and are never reloaded during run.
+    Cache statistics are reported with "--verbose" or "--debug".
+'''
+
+J2SUBST_CLI_HELP_LAZY = '''
+    Load configuration lazily: files within configuration directories are named after top-level keys
+    (e.g. "nginx.yml" defines only "nginx" key) and are parsed on first access to their key.
+
+    "--dump" and "--strict" load whole configuration.
+'''
+
+J2SUBST_CLI_HELP_MODE = '''
+    Processing mode: "jinja" (default) or "envsubst".
+
+    In "envsubst" mode only "$VAR" and "${VAR}" are substituted from environment (like envsubst(1)),
+    Jinja2 and configuration are not used at all.
+'''
+
+J2SUBST_CLI_HELP_FILES_FROM = '''
+    Read template file names (or directories) from file ("-" for stdin) in addition to arguments.
+
+    Names are delimited by NUL (e.g. "find -print0") or newline and are processed as soon as they are read.
+'''
+
+J2SUBST_CLI_HELP_CHANGED_SINCE = '''
+    Render only templates affected by changes since git commit (e.g. "origin/main").
+
+    Template is affected if its file, included/imported templates or used configuration keys are changed,
+    or output file does not exist. All templates are rendered if it's not possible to decide.
+'''
+
+J2SUBST_CLI_HELP_SHARD = '''
+    Render only K-th of N shards of templates (e.g. "2/4").
+
+    Templates are split between shards deterministically by path relative to current directory.
+    With "--shard-costs", templates are split by their estimated cost instead.
+'''
+
+J2SUBST_CLI_HELP_SHARD_COSTS = '''
+    Read template render durations (same format as "--timing-history") to split templates between shards by cost.
+
+    File must be the same for all shards (e.g. committed into repository), it's never written.
+    If file does not exist, templates are split by path.
+'''
+
+J2SUBST_CLI_HELP_SHARD_MANIFEST = '''
+    Write JSON manifest with shard assignment of all templates (see "--shard").
+'''
+
+J2SUBST_CLI_HELP_TIMING_HISTORY = '''
+    Record template render durations into JSON file and use them to schedule most expensive templates first.
+
+    Templates without recorded durations are estimated by their file size.
+'''
+
+J2SUBST_CLI_HELP_OUTPUT_TAR = '''
+    Write output files as members of tar archive (use "-" for stdout) instead of writing them to filesystem.
+
+    Member names are output file names relative to current working directory.
+'''
+
 J2SUBST_CLI_HELP_PYTHON_MODULES = '''
     Space-separated list of Python modules to import.
 
     To import module with an alias, use format: <alias_name>:<module_name>.
 '''
 
+J2SUBST_CLI_HELP_PRELOAD = '''
+    Template (macro library) to load once and expose as global, in format: <name>=<template>.
+
+    May be specified several times, same as '{% import "<template>" as <name> %}' in every template.
+'''
+
 
 def __dump_callback(_ctx: Any, _param: Any, value: str | bool | None) -> J2substDumpFormat | None:
     if value is None:
@@ -80,6 +214,12 @@ def __dump_callback(_ctx: Any, _param: Any, value: str | bool | None) -> J2subst
     raise click.BadParameter(f"must be one of: {', '.join([e.name for e in J2substDumpFormat])}.")
 
 
+def __mode_callback(_ctx: Any, _param: Any, value: str | None) -> J2substMode:
+    if value is None:
+        return J2SUBST_MODE
+    return J2substMode[value.upper()]
+
+
 J2SUBST_CLI_CONTEXT_SETTINGS = {
     'help_option_names': ['-h', '--help'],
 }
@@ -122,6 +262,18 @@ J2SUBST_CLI_CONTEXT_SETTINGS = {
     metavar='FORMAT',
 )
 
+@click.option('--compile',
+    'o_compile',
+    help=J2SUBST_CLI_HELP_COMPILE,
+    metavar='PATH',
+)
+
+@click.option('--mode',
+    'o_mode', type=click.Choice([ e.name.lower() for e in J2substMode ], case_sensitive=False), callback=__mode_callback,
+    envvar='J2SUBST_MODE',
+    help=J2SUBST_CLI_HELP_MODE,
+)
+
 @click.option('--verbose', '-v',
     'o_verbose', count=True,
     envvar='J2SUBST_VERBOSE',
@@ -153,12 +305,60 @@ J2SUBST_CLI_CONTEXT_SETTINGS = {
     envvar='J2SUBST_UNLINK',
     help='Delete template files after expanding it.',
 )
+@click.option('--sync',
+    'o_sync', is_flag=True,
+    envvar='J2SUBST_SYNC',
+    help='Flush written files to disk once after processing all templates.',
+)
 @click.option('--depth', '-d',
     'o_depth', type=click.IntRange(1, J2SUBST_MAX_DEPTH),
     envvar='J2SUBST_DEPTH',
     help='Set recursion depth to look for template files.',
     metavar='INTEGER',
 )
+@click.option('--files-from',
+    'o_files_from',
+    envvar='J2SUBST_FILES_FROM',
+    help=J2SUBST_CLI_HELP_FILES_FROM,
+    metavar='FILE',
+)
+
+@click.option('--changed-since',
+    'o_changed_since',
+    envvar='J2SUBST_CHANGED_SINCE',
+    help=J2SUBST_CLI_HELP_CHANGED_SINCE,
+    metavar='REF',
+)
+@click.option('--shard',
+    'o_shard',
+    envvar='J2SUBST_SHARD',
+    help=J2SUBST_CLI_HELP_SHARD,
+    metavar='K/N',
+)
+@click.option('--shard-manifest',
+    'o_shard_manifest',
+    envvar='J2SUBST_SHARD_MANIFEST',
+    help=J2SUBST_CLI_HELP_SHARD_MANIFEST,
+    metavar='PATH',
+)
+@click.option('--shard-costs',
+    'o_shard_costs',
+    envvar='J2SUBST_SHARD_COSTS',
+    help=J2SUBST_CLI_HELP_SHARD_COSTS,
+    metavar='PATH',
+)
+@click.option('--timing-history',
+    'o_timing_history',
+    envvar='J2SUBST_TIMING_HISTORY',
+    help=J2SUBST_CLI_HELP_TIMING_HISTORY,
+    metavar='PATH',
+)
+@click.option('--output-tar',
+    'o_output_tar',
+    envvar='J2SUBST_OUTPUT_TAR',
+    help=J2SUBST_CLI_HELP_OUTPUT_TAR,
+    metavar='PATH',
+)
 
 @click.option('--config-path', '-c',
     'o_config_path',
@@ -166,6 +366,12 @@ J2SUBST_CLI_CONTEXT_SETTINGS = {
     help=J2SUBST_CLI_HELP_CONFIG_PATH,
     metavar='LIST',
 )
+@click.option('--config-tree',
+    'o_config_tree',
+    envvar='J2SUBST_CONFIG_TREE',
+    help=J2SUBST_CLI_HELP_CONFIG_TREE,
+    metavar='LIST',
+)
 @click.option('--template-path', '-t',
     'o_template_path',
     default=J2SUBST_TEMPLATE_PATH,
@@ -173,6 +379,51 @@ J2SUBST_CLI_CONTEXT_SETTINGS = {
     help=J2SUBST_CLI_HELP_TEMPLATE_PATH,
     metavar='LIST',
 )
+@click.option('--profile',
+    'o_profile', multiple=True,
+    envvar='J2SUBST_PROFILE',
+    help=J2SUBST_CLI_HELP_PROFILE,
+    metavar='NAME=LIST',
+)
+@click.option('--profile-output',
+    'o_profile_output',
+    envvar='J2SUBST_PROFILE_OUTPUT',
+    help=J2SUBST_CLI_HELP_PROFILE_OUTPUT,
+    metavar='PATH',
+)
+@click.option('--precompiled',
+    'o_precompiled',
+    envvar='J2SUBST_PRECOMPILED',
+    help=J2SUBST_CLI_HELP_PRECOMPILED,
+    metavar='PATH',
+)
+@click.option('--freeze',
+    'o_freeze', is_flag=True,
+    envvar='J2SUBST_FREEZE',
+    help=J2SUBST_CLI_HELP_FREEZE,
+)
+@click.option('--compact',
+    'o_compact', is_flag=True,
+    envvar='J2SUBST_COMPACT',
+    help=J2SUBST_CLI_HELP_COMPACT,
+)
+@click.option('--lazy',
+    'o_lazy', is_flag=True,
+    envvar='J2SUBST_LAZY',
+    help=J2SUBST_CLI_HELP_LAZY,
+)
+@click.option('--cache-size',
+    'o_cache_size', type=click.IntRange(0),
+    envvar='J2SUBST_CACHE_SIZE',
+    help=J2SUBST_CLI_HELP_CACHE_SIZE,
+    default=J2SUBST_TEMPLATE_CACHE_SIZE,
+    metavar='INTEGER',
+)
+@click.option('--partial-eval',
+    'o_partial_eval', is_flag=True,
+    envvar='J2SUBST_PARTIAL_EVAL',
+    help=J2SUBST_CLI_HELP_PARTIAL_EVAL,
+)
 
 ## extra options
 @click.option('--python-modules',
@@ -181,6 +432,12 @@ J2SUBST_CLI_CONTEXT_SETTINGS = {
     help=J2SUBST_CLI_HELP_PYTHON_MODULES,
     metavar='LIST',
 )
+@click.option('--preload',
+    'o_preload', multiple=True,
+    envvar='J2SUBST_PRELOAD',
+    help=J2SUBST_CLI_HELP_PRELOAD,
+    metavar='NAME=TEMPLATE',
+)
 @click.option('--dict-name-cfg',
     'o_dict_name_cfg',
     envvar='J2SUBST_DICT_NAME_CFG',
@@ -208,6 +465,8 @@ def cli(ctx: click.Context,
         o_help_template_path: bool,
 
         o_dump_fmt: J2substDumpFormat | None,
+        o_compile: str | None,
+        o_mode: J2substMode,
 
         o_verbose: int,
         o_quiet: bool,
@@ -215,11 +474,29 @@ def cli(ctx: click.Context,
         o_strict: bool,
         o_force: bool,
         o_unlink: bool,
+        o_sync: bool,
         o_depth: int | None,
+        o_files_from: str | None,
+        o_changed_since: str | None,
+        o_shard: str | None,
+        o_shard_manifest: str | None,
+        o_shard_costs: str | None,
+        o_timing_history: str | None,
+        o_output_tar: str | None,
         o_config_path: str | None,
+        o_config_tree: str | None,
         o_template_path: str | None,
+        o_profile: tuple[str],
+        o_profile_output: str | None,
+        o_precompiled: str | None,
+        o_freeze: bool,
+        o_compact: bool,
+        o_lazy: bool,
+        o_partial_eval: bool,
+        o_cache_size: int,
 
         o_python_modules: str | None,
+        o_preload: tuple[str],
         o_dict_name_cfg: str | None,
         o_dict_name_env: str | None,
 
@@ -251,11 +528,27 @@ def cli(ctx: click.Context,
 
         __dump_usage_error('o_force',  '--force')
         __dump_usage_error('o_unlink', '--unlink')
+        __dump_usage_error('o_sync',   '--sync')
+        __dump_usage_error('o_mode',   '--mode')
         __dump_usage_error('o_depth',  '--depth')
+        __dump_usage_error('o_files_from', '--files-from')
+        __dump_usage_error('o_changed_since', '--changed-since')
+        __dump_usage_error('o_shard',  '--shard')
+        __dump_usage_error('o_shard_manifest', '--shard-manifest')
+        __dump_usage_error('o_shard_costs',    '--shard-costs')
+        __dump_usage_error('o_timing_history', '--timing-history')
+        __dump_usage_error('o_output_tar',     '--output-tar')
 
         __dump_usage_error('o_template_path', '--template-path')
+        __dump_usage_error('o_profile',        '--profile')
+        __dump_usage_error('o_profile_output', '--profile-output')
+        __dump_usage_error('o_precompiled',   '--precompiled')
+        __dump_usage_error('o_partial_eval',  '--partial-eval')
+        __dump_usage_error('o_cache_size',    '--cache-size')
+        __dump_usage_error('o_compile',       '--compile')
 
         __dump_usage_error('o_python_modules', '--python-modules')
+        __dump_usage_error('o_preload',        '--preload')
         __dump_usage_error('o_dict_name_cfg',  '--dict-name-cfg')
         __dump_usage_error('o_dict_name_env',  '--dict-name-env')
 
@@ -263,6 +556,58 @@ def cli(ctx: click.Context,
         if len(list(cli_args)) > 0:
             raise click.UsageError("Cannot use --dump with arguments", ctx)
 
+    _profiles: dict[str, list[str]] = {}
+    for p in o_profile:
+        _name, _sep, _path = p.partition('=')
+        if (not _sep) or (not _name) or (not _path):
+            raise click.UsageError(f'not valid "profile": {repr(p)}', ctx)
+        if _name in _profiles:
+            raise click.UsageError(f'duplicate "profile": {repr(_name)}', ctx)
+        _profiles[_name] = str_split_to_list(_path, ':')
+
+    _shard: tuple[int, int] | None = None
+    if o_shard is not None:
+        try:
+            _shard = parse_shard(o_shard)
+        except ValueError as e:
+            raise click.UsageError(str(e), ctx) from e
+    elif o_shard_manifest is not None:
+        raise click.UsageError('Cannot use --shard-manifest without --shard', ctx)
+    elif o_shard_costs is not None:
+        raise click.UsageError('Cannot use --shard-costs without --shard', ctx)
+
+    _preload: dict[str, str] = {}
+    for p in o_preload:
+        _name, _sep, _template = p.partition('=')
+        if (not _sep) or (not _name) or (not _template):
+            raise click.UsageError(f'not valid "preload": {repr(p)}', ctx)
+        if _name in _preload:
+            raise click.UsageError(f'duplicate "preload": {repr(_name)}', ctx)
+        _preload[_name] = _template
+
+    if o_mode == J2substMode.ENVSUBST:
+        if _profiles:
+            raise click.UsageError('Cannot use --profile in "envsubst" mode', ctx)
+        if _preload:
+            raise click.UsageError('Cannot use --preload in "envsubst" mode', ctx)
+        if o_compile is not None:
+            raise click.UsageError('Cannot use --compile in "envsubst" mode', ctx)
+
+    if (o_output_tar is not None) and (o_compile is not None):
+        raise click.UsageError('Cannot use --output-tar with --compile', ctx)
+    if (o_output_tar is not None) and (o_changed_since is not None):
+        ## NB: archive has to contain all output files, not only changed ones
+        raise click.UsageError('Cannot use --output-tar with --changed-since', ctx)
+
+    if o_partial_eval and not o_freeze:
+        raise click.UsageError('Cannot use --partial-eval without --freeze', ctx)
+
+    if _profiles:
+        if o_profile_output is None:
+            raise click.UsageError('Cannot use --profile without --profile-output', ctx)
+    elif o_profile_output is not None:
+        raise click.UsageError('Cannot use --profile-output without --profile', ctx)
+
     ## adjust verbosity level:
     ## -1 - quiet
     ##  0 - warnings
@@ -275,12 +620,24 @@ def cli(ctx: click.Context,
     if o_config_path is not None:
         _config_path = str_split_to_list(o_config_path, ':')
 
+    _config_tree: dict[str, str] = {}
+    if o_config_tree is not None:
+        for t in str_split_to_list(o_config_tree, ':'):
+            _key, _sep, _path = t.partition('=')
+            if (not _sep) or (not _key) or (not _path):
+                raise click.UsageError(f'not valid "config_tree": {repr(t)}', ctx)
+            _config_tree[_key] = _path
+
     if o_dump_fmt is not None:
         j = J2subst(dump_only=True,
             verbosity=o_verbose,
             debug=o_debug,
             strict=o_strict,
             config_path=_config_path,
+            freeze_config=o_freeze,
+            compact_config=o_compact,
+            lazy_config=o_lazy,
+            config_tree=_config_tree,
         )
 
         ## TODO: support --dump with output file name
@@ -322,7 +679,7 @@ def cli(ctx: click.Context,
                 raise click.UsageError(f'not valid "python_modules": {repr(m)}', ctx)
 
     args: list[str] = list(cli_args)
-    if len(args) == 0:
+    if (len(args) == 0) and (o_files_from is None):
         if is_ci():
             args = [ os.getcwd() ]
         else:
@@ -339,25 +696,133 @@ def cli(ctx: click.Context,
             template_path=_template_path,
 
             python_modules=_python_modules,
+            preload=_preload,
             dict_name_cfg=o_dict_name_cfg,
             dict_name_env=o_dict_name_env,
+
+            precompiled_path=o_precompiled,
+            partial_eval=o_partial_eval,
+            template_cache_size=o_cache_size,
+
+            freeze_config=o_freeze,
+            compact_config=o_compact,
+            lazy_config=o_lazy,
+            config_tree=_config_tree,
+
+            mode=o_mode,
+
+            timing_history=o_timing_history,
+            shard_costs=o_shard_costs if _shard is not None else None,
+            output_tar=o_output_tar,
+            changed_since=o_changed_since,
     )
 
+    def __report_cache():
+        if o_mode == J2substMode.ENVSUBST:
+            return
+        if (o_verbose > 0) or o_debug:
+            _s = j.template_cache_stats()
+            click.echo(f'J2subst: template cache: {_s["hits"]} hit(s), {_s["misses"]} miss(es), {_s["evictions"]} eviction(s)', err=True)
+
+    ## positional arguments and then names from "--files-from" (read on demand)
+    _args: Iterable[str] = args
+    if o_files_from is not None:
+        try:
+            _args = itertools.chain(args, open_file_list(o_files_from))
+        except OSError as e:
+            raise click.UsageError(f'unable to read "files-from": {e}', ctx) from e
+
+    if o_compile is not None:
+        if not j.compile_templates(o_compile, _args, o_depth):
+            ctx.exit(1)
+        ctx.exit(0)
+
+    _plan: list[J2substShardItem] | None = None
+    if _shard is not None:
+        _plan = j.plan_shards(_args, o_depth, _shard[1])
+        if (o_shard_manifest is not None) and not j.write_shard_manifest(o_shard_manifest, _plan, _shard[1]):
+            ctx.exit(1)
+
+        _total = len(_plan)
+        _plan = [ i for i in _plan if i.shard == _shard[0] ]
+        if (o_verbose > 0) or o_debug:
+            click.echo(f'J2subst: shard {_shard[0]}/{_shard[1]}: {len(_plan)} of {_total} template(s)', err=True)
+
+    if _profiles:
+        for _name, _path in _profiles.items():
+            j.load_profile(_name, _path)
+
+        ## disallow stdin/stdout in profile mode
+        _opts = j.render_options(allow_stdin_stdout=False)
+
+        ## per-profile accounting
+        _stats: dict[str, list[int]] = { p: [0, 0] for p in _profiles }
+        for i in (_plan or []):
+            _i_opts = dataclasses.replace(_opts, context_root=i.base_dir)
+            for p, r in j.render_file_profiles(i.template, o_profile_output, i.base_dir, options=_i_opts).items():
+                _stats[p][0 if r else 1] += 1
+        for arg in (_args if _plan is None else []):
+            if os.path.isdir(arg):
+                _d_opts = dataclasses.replace(_opts, context_root=arg)
+                for f in j.schedule_templates(j.iter_templates(arg, o_depth)):
+                    for p, r in j.render_file_profiles(f, o_profile_output, arg, options=_d_opts).items():
+                        _stats[p][0 if r else 1] += 1
+            else:
+                for p, r in j.render_file_profiles(arg, o_profile_output, options=_opts).items():
+                    _stats[p][0 if r else 1] += 1
+
+        r = True
+        for p, (_ok, _failed) in _stats.items():
+            if _failed:
+                r = False
+            if (o_verbose >= 0 and _failed) or (o_verbose > 0) or o_debug:
+                click.echo(f'J2subst: profile {repr(p)}: {_ok} rendered, {_failed} failed', err=True)
+
+        if not j.save_timing_history():
+            r = False
+        if not j.close_outputs():
+            r = False
+
+        __report_cache()
+
+        if o_sync:
+            j.sync_outputs()
+
+        if not r:
+            ctx.exit(1)
+        ctx.exit(0)
+
     ## deal with 1/2 argument mode
-    _in, _out = j.handle_simple_cli_args(*args[:2])
+    _in, _out = (None, None)
+    if (_plan is None) and (o_files_from is None):
+        _in, _out = j.handle_simple_cli_args(*args[:2])
 
     r = True
-    if _in:
+    if _plan is not None:
+        ## disallow stdin/stdout from this moment
+        _opts = j.render_options(allow_stdin_stdout=False)
+
+        for i in _plan:
+            r &= j.render_file(i.template, options=dataclasses.replace(_opts, context_root=i.base_dir))
+    elif _in:
         r &= j.render_file(_in, _out)
     else:
         ## disallow stdin/stdout from this moment
-        j.allow_stdin_stdout = False
+        _opts = j.render_options(allow_stdin_stdout=False)
 
-        for arg in args:
+        for arg in _args:
             if os.path.isdir(arg):
-                r &= j.render_directory(arg, o_depth)
+                r &= j.render_directory(arg, o_depth, options=_opts)
             else:
-                r &= j.render_file(arg)
+                r &= j.render_file(arg, options=_opts)
+
+    r &= j.save_timing_history()
+    r &= j.close_outputs()
+
+    __report_cache()
+
+    if o_sync:
+        j.sync_outputs()
 
     if not r:
         ctx.exit(1)
@@ -56,16 +56,35 @@ Corresponding environment variables are also supported.
 |------------------------+------------------+---------|
 | Environment variable   | Flag option      | Type    |
 |------------------------+------------------+---------|
+| J2SUBST_MODE           | --mode           | string  |
 | J2SUBST_VERBOSE        | --verbose        | integer |
 | J2SUBST_QUIET          | --quiet          | flag    |
 | J2SUBST_DEBUG          | --debug          | flag    |
 | J2SUBST_STRICT         | --strict         | flag    |
 | J2SUBST_FORCE          | --force          | flag    |
 | J2SUBST_UNLINK         | --unlink         | flag    |
+| J2SUBST_SYNC           | --sync           | flag    |
 | J2SUBST_DEPTH          | --depth          | integer |
+| J2SUBST_FILES_FROM     | --files-from     | string  |
+| J2SUBST_CHANGED_SINCE  | --changed-since  | string  |
+| J2SUBST_SHARD          | --shard          | string  |
+| J2SUBST_SHARD_MANIFEST | --shard-manifest | string  |
+| J2SUBST_SHARD_COSTS    | --shard-costs    | string  |
+| J2SUBST_TIMING_HISTORY | --timing-history | string  |
+| J2SUBST_OUTPUT_TAR     | --output-tar     | string  |
 | J2SUBST_CONFIG_PATH    | --config-path    | string  |
+| J2SUBST_CONFIG_TREE    | --config-tree    | string  |
 | J2SUBST_TEMPLATE_PATH  | --template-path  | string  |
+| J2SUBST_PROFILE        | --profile        | string  |
+| J2SUBST_PROFILE_OUTPUT | --profile-output | string  |
+| J2SUBST_PRECOMPILED    | --precompiled    | string  |
+| J2SUBST_CACHE_SIZE     | --cache-size     | integer |
+| J2SUBST_FREEZE         | --freeze         | flag    |
+| J2SUBST_COMPACT        | --compact        | flag    |
+| J2SUBST_LAZY           | --lazy           | flag    |
+| J2SUBST_PARTIAL_EVAL   | --partial-eval   | flag    |
 | J2SUBST_PYTHON_MODULES | --python-modules | string  |
+| J2SUBST_PRELOAD        | --preload        | string  |
 | J2SUBST_DICT_NAME_CFG  | --dict-name-cfg  | string  |
 | J2SUBST_DICT_NAME_ENV  | --dict-name-env  | string  |
 |------------------------+------------------+---------|
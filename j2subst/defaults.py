@@ -4,6 +4,7 @@ from typing import (
 
 ## this module
 from .dumpfmt import J2substDumpFormat
+from .mode import J2substMode
 
 
 J2SUBST_VERSION = '0.0.5'
@@ -13,12 +14,24 @@ J2SUBST_DICT_NAME_ENV = 'env'
 
 J2SUBST_TEMPLATE_EXT = '.j2'
 
+## default name for item in matrix templates
+J2SUBST_MATRIX_ITEM = 'item'
+
+## per-directory context: "_context.j2" (template) and/or "_context.yml" etc. (data)
+J2SUBST_DIR_CONTEXT = '_context'
+
 J2SUBST_TEMPLATE_PATH_PARTS = [ '@{ORIGIN}', '@{CWD}' ]
 J2SUBST_TEMPLATE_PATH = ':'.join(J2SUBST_TEMPLATE_PATH_PARTS)
 
 ## merely ephemeral
 J2SUBST_MAX_DEPTH = 20
 
+## maximum number of templates rendered concurrently by async API
+J2SUBST_ASYNC_CONCURRENCY = 16
+
+## maximum number of distinct compiled templates kept in memory (0 disables cache)
+J2SUBST_TEMPLATE_CACHE_SIZE = 10000
+
 ## NB: leading dots are mandatory!
 J2SUBST_CONFIG_EXT = [
     '.yaml', '.yml',
@@ -29,6 +42,7 @@ J2SUBST_CONFIG_EXT = [
 J2SUBST_JINJA_EXTENSIONS = [
     'jinja2.ext.do',
     'jinja2.ext.loopcontrols',
+    'j2subst.ext.J2substOutputExtension',
 ]
 
 J2SUBST_JINJA_DEBUG_EXTENSIONS = [
@@ -84,5 +98,7 @@ J2SUBST_ENV_CI = [
 
 J2SUBST_DUMP_FORMAT = J2substDumpFormat.YAML
 
+J2SUBST_MODE = J2substMode.JINJA
+
 J2SUBST_EMPTY_YAML = '\n---\n# empty\n---\n'
 J2SUBST_EMPTY_JSON = '{}'
@@ -0,0 +1,49 @@
+import os
+import re
+
+from collections.abc import (
+    Iterator,
+    Mapping,
+)
+from typing import (
+    BinaryIO,
+)
+
+
+## same syntax as envsubst(1): "$VAR" and "${VAR}"
+J2SUBST_ENVSUBST_RE = re.compile(rb'\$(?:\{([A-Za-z_][A-Za-z0-9_]*)\}|([A-Za-z_][A-Za-z0-9_]*))')
+
+J2SUBST_ENVSUBST_CHUNK_SIZE = 1 << 20
+
+
+## envsubst(1) replacement: variables are substituted from "env", undefined variables are replaced with empty string.
+## works with bytes, so neither decoding nor encoding takes place.
+class J2substEnvsubst:
+
+    def __init__(self, env: Mapping[str, str]):
+        self.env: dict[bytes, bytes] = { os.fsencode(k): os.fsencode(v) for k, v in env.items() }
+
+    def __replace(self, m: re.Match[bytes]) -> bytes:
+        return self.env.get(m.group(1) or m.group(2), b'')
+
+    def substitute(self, data: bytes) -> bytes:
+        if b'$' not in data:
+            ## fastpath
+            return data
+        return J2SUBST_ENVSUBST_RE.sub(self.__replace, data)
+
+    ## variable names never span lines, so input is processed in chunks of whole lines
+    def stream(self, f: BinaryIO, chunk_size: int = J2SUBST_ENVSUBST_CHUNK_SIZE) -> Iterator[bytes]:
+        tail = b''
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            if tail:
+                data = tail + data
+            i = data.rfind(b'\n') + 1
+            tail = data[i:]
+            if i:
+                yield self.substitute(data[:i])
+        if tail:
+            yield self.substitute(tail)
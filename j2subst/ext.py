@@ -0,0 +1,47 @@
+from typing import (
+    Any,
+    Callable,
+)
+
+## jinja2
+import jinja2
+import jinja2.ext
+import jinja2.nodes
+import jinja2.parser
+import jinja2.runtime
+
+
+## {% output "path" %}...{% endoutput %}
+class J2substOutputExtension(jinja2.ext.Extension):
+    tags = { 'output' }
+
+    def parse(self, parser: jinja2.parser.Parser) -> jinja2.nodes.Node:
+        lineno = next(parser.stream).lineno
+
+        path = parser.parse_expression()
+        body = parser.parse_statements(('name:endoutput',), drop_needle=True)
+
+        return jinja2.nodes.CallBlock(
+            self.call_method('_output', [path, jinja2.nodes.ContextReference()]),
+            [], [], body,
+        ).set_lineno(lineno)
+
+    def _output(self, path: Any, context: jinja2.runtime.Context, caller: Callable[[], Any]) -> Any:
+        emit = context.get('j2subst_emit')
+        if emit is None:
+            raise jinja2.TemplateRuntimeError('"output" is not supported for this template')
+        if not path:
+            raise jinja2.TemplateRuntimeError('"output" requires non-empty file name')
+
+        if self.environment.is_async:
+            return self.__output_async(emit, str(path), caller)
+
+        ## rendered block goes to the file instead of template output
+        emit(str(path), caller())
+        return ''
+
+    @staticmethod
+    async def __output_async(emit: Callable[[str, str], Any], path: str, caller: Callable[[], Any]) -> str:
+        content = await caller()
+        await emit(path, content)
+        return ''
@@ -0,0 +1,59 @@
+import os
+import sys
+
+from collections.abc import (
+    Iterator,
+)
+from os import (
+    PathLike,
+)
+
+
+J2SUBST_FILE_LIST_CHUNK = 65536
+
+
+## file names from "-" (stdin) or file, delimited by NUL (e.g. "find -print0", "git ls-files -z") or newline.
+## delimiter is detected by first one found in input.
+## names are yielded as soon as they are read (i.e. before input is closed by writer), empty names are skipped.
+## file is opened immediately (so errors are raised here), not on first iteration.
+def open_file_list(path: str | PathLike[str]) -> Iterator[str]:
+    if str(path) == '-':
+        return __iter_names(sys.stdin.fileno(), False)
+
+    return __iter_names(os.open(path, os.O_RDONLY | os.O_CLOEXEC), True)
+
+
+def __iter_names(fd: int, close: bool) -> Iterator[str]:
+    try:
+        yield from __read_names(fd)
+    finally:
+        if close:
+            os.close(fd)
+
+
+def __read_names(fd: int) -> Iterator[str]:
+    sep: bytes | None = None
+    buf = b''
+    while True:
+        ## os.read() returns as soon as some data is available (unlike buffered read)
+        chunk = os.read(fd, J2SUBST_FILE_LIST_CHUNK)
+        if not chunk:
+            break
+        buf += chunk
+
+        if sep is None:
+            i_nul, i_nl = buf.find(b'\0'), buf.find(b'\n')
+            if i_nul < 0 and i_nl < 0:
+                continue
+            if i_nl < 0 or (0 <= i_nul < i_nl):
+                sep = b'\0'
+            else:
+                sep = b'\n'
+
+        *names, buf = buf.split(sep)
+        for n in names:
+            if n:
+                yield os.fsdecode(n)
+
+    if buf:
+        yield os.fsdecode(buf)
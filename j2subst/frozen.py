@@ -0,0 +1,162 @@
+import sys
+
+from collections.abc import (
+    Mapping,
+    MutableMapping,
+    Set,
+)
+from typing import (
+    Any,
+    NoReturn,
+)
+
+## this module
+from .functions import (
+    is_map,
+    is_seq,
+)
+
+
+def _read_only(*_args: Any, **_kwargs: Any) -> NoReturn:
+    raise TypeError('J2subst: configuration is read-only')
+
+
+class J2substFrozenDict(dict[Any, Any]):
+    __slots__ = ()
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    __ior__ = _read_only
+    clear = _read_only
+    pop = _read_only
+    popitem = _read_only
+    setdefault = _read_only
+    update = _read_only
+
+    ## NB: dict.__init__() does not call __setitem__()
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (J2substFrozenDict, (dict(self),))
+
+    def __copy__(self) -> 'J2substFrozenDict':
+        return self
+
+    def __deepcopy__(self, _memo: Any) -> 'J2substFrozenDict':
+        return self
+
+
+class J2substFrozenList(tuple[Any, ...]):
+    __slots__ = ()
+
+    ## keep rendered output the same as for regular list
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    ## keep concatenation with regular lists working (e.g. "cfg.items + [ x ]"), result is new (mutable) list
+    def __add__(self, other: Any) -> Any:
+        if isinstance(other, (list, tuple)):
+            return list(self) + list(other)
+        return NotImplemented
+
+    def __radd__(self, other: Any) -> Any:
+        if isinstance(other, (list, tuple)):
+            return list(other) + list(self)
+        return NotImplemented
+
+
+def is_frozen(x: Any) -> bool:
+    return isinstance(x, (J2substFrozenDict, J2substFrozenList))
+
+
+def freeze(x: Any) -> Any:
+    if is_frozen(x):
+        return x
+    if isinstance(x, str):
+        return sys.intern(x)
+    if isinstance(x, (bytes, bytearray)):
+        return bytes(x)
+    if is_map(x) and not isinstance(x, MutableMapping):
+        ## already read-only (and likely evaluated on demand)
+        return x
+    if is_map(x):
+        return J2substFrozenDict(
+            (sys.intern(k) if isinstance(k, str) else k, freeze(v)) for k, v in x.items()
+        )
+    if is_seq(x):
+        return J2substFrozenList(freeze(v) for v in x)
+    if isinstance(x, Set):
+        return frozenset(freeze(v) for v in x)
+    return x
+
+
+## reverse operation: make mutable (and serializable) copy
+def thaw(x: Any) -> Any:
+    if isinstance(x, Mapping):
+        return { k: thaw(v) for k, v in x.items() }
+    if isinstance(x, J2substFrozenList):
+        return [ thaw(v) for v in x ]
+    if isinstance(x, frozenset):
+        return set(thaw(v) for v in x)
+    return x
+
+
+## interns strings and shares equal scalars/subtrees between configuration fragments
+## NB: subtrees are shared only if "freeze" is True (shared mutable subtrees are error-prone)
+class J2substCompactor:
+
+    def __init__(self, freeze: bool = False):
+        self.freeze = freeze
+        self.memo: dict[Any, Any] = {}
+
+    def __share(self, key: Any, x: Any) -> Any:
+        return self.memo.setdefault(key, x)
+
+    def compact(self, x: Any) -> Any:
+        if isinstance(x, str):
+            return sys.intern(x)
+        if isinstance(x, (bytes, bytearray)):
+            x = bytes(x)
+        elif is_map(x):
+            items = [ (self.compact(k), self.compact(v)) for k, v in x.items() ]
+            if not self.freeze:
+                return dict(items)
+            ## children are already shared (and kept alive by memo), so their ids identify their values
+            key = (J2substFrozenDict, tuple((id(k), id(v)) for k, v in items))
+            if key in self.memo:
+                return self.memo[key]
+            return self.__share(key, J2substFrozenDict(items))
+        elif is_seq(x):
+            values = [ self.compact(v) for v in x ]
+            if not self.freeze:
+                return values
+            key = (J2substFrozenList, tuple(id(v) for v in values))
+            if key in self.memo:
+                return self.memo[key]
+            return self.__share(key, J2substFrozenList(values))
+        elif isinstance(x, Set):
+            x = frozenset(self.compact(v) for v in x)
+
+        try:
+            ## type is the part of key: 1, 1.0 and True are equal but not the same
+            return self.__share((type(x), x), x)
+        except TypeError:
+            ## not hashable
+            return x
+
+
+## approximate memory footprint: every object is counted only once
+def deep_sizeof(x: Any) -> int:
+    seen: set[int] = set()
+    total = 0
+    stack = [x]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, Mapping):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, Set)):
+            stack.extend(o)
+    return total
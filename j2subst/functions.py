@@ -1,12 +1,17 @@
 import hashlib
 import io
+import json
 import os
 import os.path
 import re
 import sys
+import threading
+import tomllib
+import types
 
 from collections.abc import (
     Hashable,
+    Iterable,
     Mapping,
     Sequence,
 )
@@ -18,9 +23,15 @@ from typing import (
     Callable,
 )
 
+## Jinja2
+import jinja2
+
 ## natsort
 import natsort
 
+## pyyaml
+import yaml
+
 ## this module
 from .defaults import (
     J2SUBST_ENV_CI,
@@ -243,6 +254,121 @@ def list_intersect(a: Sequence[Any], b: Sequence[Any]) -> list[Any]:
     return list(set(a) & set(b))
 
 
+## cache is dropped entirely when limit is reached
+J2SUBST_INDEX_CACHE_SIZE = 4096
+
+
+## indexes of immutable sequences/mappings (e.g. read-only configuration) are built only once per J2subst instance:
+## cache is attached to Jinja2 environment (see J2SUBST_INDEX_CACHE_ATTR), so it lives as long as J2subst instance does
+class J2substIndexCache:
+
+    def __init__(self, capacity: int = J2SUBST_INDEX_CACHE_SIZE):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        ## (id(container), kind, key) -> (container, index)
+        ## NB: container is referenced to keep its id() valid
+        self.items: dict[tuple[int, str, str], tuple[Any, Mapping[Any, Any]]] = {}
+
+    def get(self, a: Any, kind: str, key: str, build: Callable[[], Mapping[Any, Any]]) -> Mapping[Any, Any]:
+        ck = (id(a), kind, key)
+        x = self.items.get(ck)
+        if (x is not None) and (x[0] is a):
+            ## fastpath
+            return x[1]
+
+        index = build()
+        with self.lock:
+            ## cache is dropped entirely when limit is reached
+            if len(self.items) >= self.capacity:
+                self.items.clear()
+            self.items[ck] = (a, index)
+        return index
+
+
+J2SUBST_INDEX_CACHE_ATTR = 'j2subst_index_cache'
+
+
+def __item_attr(x: Any, key: str) -> Any:
+    ## dotted path, e.g. "meta.name"
+    for k in key.split('.'):
+        if is_map(x):
+            if k not in x:
+                raise KeyError(k)
+            x = x[k]
+        elif is_seq(x) and k.isdigit():
+            x = x[int(k)]
+        else:
+            x = getattr(x, k)
+    return x
+
+
+def __build_index(a: Iterable[Any], key: str, kind: str) -> dict[Any, Any]:
+    grouped = (kind == 'group_by')
+    rv: dict[Any, Any] = {}
+    for x in a:
+        ## TODO: avoid try-except
+        try:
+            v = __item_attr(x, key)
+        except (AttributeError, IndexError, KeyError):
+            ## items without key are skipped
+            continue
+        ## TODO: avoid try-except
+        try:
+            hash(v)
+        except TypeError as e:
+            raise TypeError(f'{kind}: value of key {repr(key)} is not hashable: {repr(v)}') from e
+        if grouped:
+            rv.setdefault(v, []).append(x)
+        else:
+            rv[v] = x
+    if grouped:
+        rv = { k: tuple(v) for k, v in rv.items() }
+    return rv
+
+
+def __cached_index(environment: Any, a: Iterable[Any], key: str, kind: str) -> Mapping[Any, Any]:
+    key = str(key)
+    items = a.values() if is_map(a) else a
+
+    if type(a) in (dict, list):
+        ## fastpath: regular (mutable) containers, i.e. configuration without "--freeze", are never cached
+        return __build_index(items, key, kind)
+
+    ## NB: frozen.py imports this module
+    from .frozen import is_frozen
+
+    ## only immutable containers may be cached
+    cacheable = is_frozen(a) or isinstance(a, tuple)
+
+    cache: J2substIndexCache | None = getattr(environment, J2SUBST_INDEX_CACHE_ATTR, None)
+    if (cache is None) or not cacheable:
+        return __build_index(items, key, kind)
+
+    ## NB: index is shared between all callers, so it's read-only
+    return cache.get(a, kind, key, lambda: types.MappingProxyType(__build_index(items, key, kind)))
+
+
+@jinja2.pass_environment
+def index_by(environment: Any, a: Iterable[Any], key: str) -> Mapping[Any, Any]:
+    return __cached_index(environment, a, key, 'index_by')
+
+
+@jinja2.pass_environment
+def group_by(environment: Any, a: Iterable[Any], key: str) -> Mapping[Any, Any]:
+    return __cached_index(environment, a, key, 'group_by')
+
+
+def lookup(index: Mapping[Any, Any], key: Any, default: Any = None) -> Any:
+    if not is_map(index):
+        return default
+    ## TODO: avoid try-except
+    try:
+        return index.get(key, default)
+    except TypeError:
+        ## unhashable key
+        return default
+
+
 ## ref: https://click.palletsprojects.com/en/stable/options/#values-from-environment-variables
 def click_bool(x: Any) -> bool:
     if is_str_or_path(x):
@@ -419,15 +545,137 @@ def file_sha3_512(x: str | PathLike[str]) -> str:
         return hashlib.sha3_512(f.read()).hexdigest()
 
 
+J2SUBST_FILE_CACHE_SIZE = 1024
+## total size of cached files (in bytes), larger files are never cached
+J2SUBST_FILE_CACHE_BYTES = 64 * 1048576
+
+
+## file contents are read (and parsed) only once per J2subst instance unless file is changed:
+## cache is attached to Jinja2 environment (see J2SUBST_FILE_CACHE_ATTR), same as J2substIndexCache
+class J2substFileCache:
+
+    def __init__(self, capacity: int = J2SUBST_FILE_CACHE_SIZE, max_bytes: int = J2SUBST_FILE_CACHE_BYTES):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        ## (kind, real path) -> ((device, inode, mtime, size), value)
+        self.items: dict[tuple[str, str], tuple[tuple[int, int, int, int], Any]] = {}
+        ## sum of sizes of cached files
+        self.size = 0
+
+    def get(self, kind: str, path: str, st: os.stat_result, read: Callable[[], Any]) -> Any:
+        sig = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+        ck = (kind, path)
+        x = self.items.get(ck)
+        if (x is not None) and (x[0] == sig):
+            ## fastpath
+            return x[1]
+
+        value = read()
+        if st.st_size > self.max_bytes:
+            return value
+
+        with self.lock:
+            prev = self.items.pop(ck, None)
+            if prev is not None:
+                self.size -= prev[0][3]
+            ## cache is dropped entirely when limit is reached
+            if (len(self.items) >= self.capacity) or (self.size + st.st_size > self.max_bytes):
+                self.items.clear()
+                self.size = 0
+            self.items[ck] = (sig, value)
+            self.size += st.st_size
+        return value
+
+
+J2SUBST_FILE_CACHE_ATTR = 'j2subst_file_cache'
+
+
+def __parse_text(kind: str, path: str) -> Any:
+    with open(path, 'rb') as f:
+        data = f.read().decode('utf-8')
+    if kind == 'text':
+        return data
+
+    if kind == 'json':
+        x = json.loads(data)
+    elif kind == 'yaml':
+        x = yaml.safe_load(data)
+    else:
+        x = tomllib.loads(data)
+
+    ## NB: parsed value is shared between all callers, so it's read-only
+    ## NB: frozen.py imports this module
+    from .frozen import freeze
+    return freeze(x)
+
+
+def __cached_file(context: Any, name: str | PathLike[str], kind: str) -> Any:
+    ## relative paths are resolved against template directory (if any)
+    path = os.fspath(name)
+    origin = context.get('j2subst_origin')
+    if origin and not os.path.isabs(path):
+        path = os.path.join(origin, path)
+    path = os.path.realpath(path)
+
+    cache: J2substFileCache | None = getattr(context.environment, J2SUBST_FILE_CACHE_ATTR, None)
+    if cache is None:
+        return __parse_text(kind, path)
+    return cache.get(kind, path, os.stat(path), lambda: __parse_text(kind, path))
+
+
+@jinja2.pass_context
+def read_file(context: Any, name: str | PathLike[str]) -> str:
+    return __cached_file(context, name, 'text')
+
+
+@jinja2.pass_context
+def read_json(context: Any, name: str | PathLike[str]) -> Any:
+    return __cached_file(context, name, 'json')
+
+
+@jinja2.pass_context
+def read_yaml(context: Any, name: str | PathLike[str]) -> Any:
+    return __cached_file(context, name, 'yaml')
+
+
+@jinja2.pass_context
+def read_toml(context: Any, name: str | PathLike[str]) -> Any:
+    return __cached_file(context, name, 'toml')
+
+
+## NB: not in J2SUBST_FUNCTIONS
+## json.dumps() for "tojson" filter (see J2subst.__init__()):
+## mappings evaluated on demand (e.g. lazy configuration or configuration trees) are not dict, so they're converted as well
+def json_dumps(x: Any, **kwargs: Any) -> str:
+    return json.dumps(x, default=__json_default, **kwargs)
+
+
+def __json_default(x: Any) -> Any:
+    if is_map(x):
+        return dict(x.items())
+    raise TypeError(f'Object of type {type(x).__name__} is not JSON serializable')
+
+
 ## NB: not in J2SUBST_FUNCTIONS
+## all patterns are compiled into single regex (and only once)
+__j2subst_env_skip: tuple[list[str], re.Pattern[str]] | None = None
+
+
 def is_env_skipped(x: Any) -> bool:
     if not is_str_or_path(x):
         return True
-    x = str(x)
-    for r in J2SUBST_ENV_SKIP:
-        if re.match(r, x):
-            return True
-    return False
+
+    # pylint: disable=W0603
+    global __j2subst_env_skip
+
+    ## recompile if J2SUBST_ENV_SKIP was changed
+    if (__j2subst_env_skip is None) or (__j2subst_env_skip[0] != J2SUBST_ENV_SKIP):
+        ## NB: empty alternation matches everything, "(?!)" matches nothing
+        _re = '|'.join(f'(?:{r})' for r in J2SUBST_ENV_SKIP) or r'(?!)'
+        __j2subst_env_skip = (list(J2SUBST_ENV_SKIP), re.compile(_re))
+
+    return __j2subst_env_skip[1].match(str(x)) is not None
 
 
 def j2subst_escape(x: Any) -> Any:
@@ -581,6 +829,8 @@ J2SUBST_FUNCTIONS: list[Any] = [
     file_sha3_512,
     go_bool,
     go_bool_neg,
+    group_by,
+    index_by,
     is_file_io,
     is_file_io_read,
     is_file_io_write,
@@ -598,6 +848,7 @@ J2SUBST_FUNCTIONS: list[Any] = [
     join_prefix,
     list_diff,
     list_intersect,
+    lookup,
     md5,
     non_empty_str,
     only_str,
@@ -606,6 +857,10 @@ J2SUBST_FUNCTIONS: list[Any] = [
     re_match,
     re_match_neg,
     re_sub,
+    read_file,
+    read_json,
+    read_toml,
+    read_yaml,
     sha1,
     sha256,
     sha384,
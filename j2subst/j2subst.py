@@ -1,12 +1,21 @@
+import asyncio
+import dataclasses
 import io
 import os
 import os.path
 import sys
 import importlib
 import json
+import mmap
+import re
+import threading
+import time
 import tomllib
 
 from collections.abc import (
+    Callable,
+    Iterable,
+    Iterator,
     Mapping,
     Sequence,
 )
@@ -19,6 +28,7 @@ from typing import (
 
 ## jinja2
 import jinja2
+import jinja2.meta
 ## natsort
 import natsort
 ## pyyaml
@@ -26,34 +36,92 @@ import yaml
 
 ## this module
 from .dumpfmt import J2substDumpFormat
+from .envsubst import J2substEnvsubst
+from .frozen import (
+    J2substCompactor,
+    deep_sizeof,
+    freeze,
+    thaw,
+)
+from .mode import J2substMode
+from .options import J2substRenderOptions
 from .defaults import (
+    J2SUBST_ASYNC_CONCURRENCY,
     J2SUBST_BUILTIN_FUNCTION_ALIASES,
     J2SUBST_BUILTIN_FUNCTIONS,
     J2SUBST_CONFIG_EXT,
     J2SUBST_DICT_NAME_CFG,
     J2SUBST_DICT_NAME_ENV,
+    J2SUBST_DIR_CONTEXT,
     J2SUBST_DUMP_FORMAT,
     J2SUBST_EMPTY_JSON,
     J2SUBST_EMPTY_YAML,
     J2SUBST_JINJA_DEBUG_EXTENSIONS,
     J2SUBST_JINJA_EXTENSIONS,
+    J2SUBST_MATRIX_ITEM,
+    J2SUBST_MODE,
     J2SUBST_PYTHON_MODULE_ALIASES,
     J2SUBST_PYTHON_MODULES,
+    J2SUBST_TEMPLATE_CACHE_SIZE,
     J2SUBST_TEMPLATE_EXT,
     J2SUBST_TEMPLATE_PATH_PARTS,
 )
 from .functions import (
     J2SUBST_FUNCTIONS,
+    J2SUBST_FILE_CACHE_ATTR,
     J2SUBST_FUNCTION_ALIASES,
+    J2SUBST_INDEX_CACHE_ATTR,
+    J2substFileCache,
+    J2substIndexCache,
     is_ci,
-    is_env_skipped,
     is_map,
     is_plain_key,
     is_seq,
     is_stdin,
     is_stdout,
+    json_dumps,
     merge_dict_recurse,
     non_empty_str,
+    str_split_to_list,
+)
+from .changes import (
+    J2substGitChanges,
+    is_config_affected,
+    template_config_keys,
+    template_reads_files,
+)
+from .lazy import (
+    J2substEnvDict,
+    J2substLazyDict,
+    read_config_documents,
+)
+from .cache import J2substTemplateCache
+from .partial import J2substPartial
+from .shard import (
+    J2substShardItem,
+    assign_shards,
+    order_by_cost,
+    shard_manifest,
+)
+from .tarsink import (
+    J2substTarSink,
+    source_date_epoch,
+)
+from .timing import J2substTimingHistory
+from .tree import J2substConfigTree
+from .writer import (
+    J2substOutputError,
+    copy_file_atomic,
+    fsync_path,
+    write_chunks_atomic,
+    write_file_atomic,
+)
+from .loader import (
+    J2SUBST_FRONT_MATTER_ATTR,
+    J2substLoader,
+    J2substPrecompiled,
+    J2substPrecompiledWriter,
+    front_matter,
 )
 
 
@@ -72,11 +140,30 @@ class J2subst:
                  template_path: Sequence[str | PathLike[str]] | None = None,
 
                  python_modules: Sequence[str] | Mapping[str, str] | None = None,
+                 preload: Mapping[str, str] | None = None,
                  dict_name_cfg: str = J2SUBST_DICT_NAME_CFG,
                  dict_name_env: str = J2SUBST_DICT_NAME_ENV,
+
+                 precompiled_path: str | PathLike[str] | None = None,
+                 partial_eval: bool = False,
+                 template_cache_size: int = J2SUBST_TEMPLATE_CACHE_SIZE,
+
+                 freeze_config: bool = False,
+                 compact_config: bool = False,
+                 lazy_config: bool = False,
+                 config_tree: Mapping[str, str | PathLike[str]] | None = None,
+
+                 mode: J2substMode = J2SUBST_MODE,
+
+                 timing_history: str | PathLike[str] | None = None,
+                 shard_costs: str | PathLike[str] | None = None,
+                 changed_since: str | None = None,
+
+                 output_tar: str | PathLike[str] | None = None,
     ):
 
         self.dump_only = bool(dump_only)
+        self.mode = J2substMode(mode)
         if not self.dump_only:
             if not is_plain_key(dict_name_cfg):
                 raise ValueError(f'not valid "dict_name_cfg": {repr(dict_name_cfg)}')
@@ -91,14 +178,38 @@ class J2subst:
         self.force = bool(force)
         self.strict = bool(strict)
         self.unlink = False
-
-        self.dict_cfg: dict[str, Any] = {}
+        self.freeze_config = bool(freeze_config)
+        self.compact_config = bool(compact_config)
+        self.lazy_config = bool(lazy_config)
+        self.partial_eval = bool(partial_eval)
+        if self.partial_eval and not self.freeze_config:
+            raise ValueError('"partial_eval" requires "freeze_config"')
+        self.__compactor: J2substCompactor | None = None
+        self.__compact_size = 0
+        ## see J2substPartial
+        self.j2partial: J2substPartial | None = None
+
+        ## NB: J2substLazyDict with "lazy_config"
+        self.dict_cfg: Mapping[str, Any] = {}
+
+        self.__lock = threading.RLock()
+        ## output files written so far (see sync_outputs())
+        self.__written: set[str] = set()
 
         self.config_path: list[str] = []
         if config_path:
             self.config_path = non_empty_str(config_path)
 
-        self.__merge_dict_default()
+        self.config_tree: dict[str, str | PathLike[str]] = {}
+        for k, v in (config_tree or {}).items():
+            if not is_plain_key(k):
+                raise ValueError(f'not valid "config_tree" key: {repr(k)}')
+            self.config_tree[k] = v
+        self.config_trees: list[J2substConfigTree] = []
+
+        ## configuration is not used in envsubst mode
+        if self.mode != J2substMode.ENVSUBST:
+            self.__merge_dict_default()
 
         if self.dump_only:
             return
@@ -110,13 +221,72 @@ class J2subst:
         self.template_path: list[str] = non_empty_str(template_path)
 
         self.dict_env: dict[str, str] = {}
+        self.profiles: dict[str, dict[str, Any]] = {}
         self.j2fs_loaders: dict[str, jinja2.FileSystemLoader] = {}
 
         self.resolve_template_path(resolve_placeholders=False)
 
+        ## see J2substTarSink
+        self.output_tar: J2substTarSink | None = None
+        if output_tar:
+            try:
+                _mtime = source_date_epoch()
+            except ValueError as e:
+                self.__warn('__init__', f'{e}, using current time')
+                _mtime = None
+            self.output_tar = J2substTarSink(output_tar, _mtime)
+
+        self.timing: J2substTimingHistory | None = None
+        if timing_history:
+            self.timing = J2substTimingHistory(timing_history)
+            try:
+                self.timing.load()
+            except (OSError, ValueError) as e:
+                self.__warn('__init__', f'unable to read timing history, starting from empty one: {repr(timing_history)}: {e}')
+
+        ## shared (e.g. committed) durations for plan_shards(), never written:
+        ## every job must compute the same plan, so own (per-job) timing history is not used for it
+        self.shard_costs: J2substTimingHistory | None = None
+        if shard_costs:
+            if os.path.isfile(shard_costs):
+                self.shard_costs = J2substTimingHistory(shard_costs)
+                try:
+                    self.shard_costs.load()
+                except (OSError, ValueError) as e:
+                    self.__warn('__init__', f'unable to read shard costs, using path hashes: {repr(shard_costs)}: {e}')
+            else:
+                self.__warn('__init__', f'shard costs are not found, using path hashes: {repr(shard_costs)}')
+
+        ## see is_changed()
+        self.changed_since = changed_since or None
+        self.__changes: J2substGitChanges | None = None
+        self.__changes_ready = False
+        self.__changed_cfg_keys: set[str] | None = None
+        ## template file -> (referenced templates, used top-level configuration keys, whether template reads files)
+        self.__template_deps: dict[str, tuple[list[str | None], set[str] | None, bool]] = {}
+        ## files of preloaded templates (None if template is not loaded from file)
+        self.preloaded: list[str | None] = []
+        ## configuration from profiles (see load_profile())
+        self.profile_config_path: list[str] = []
+        ## see directory_context()
+        self.__dir_contexts: dict[tuple[str, str, str | None], dict[str, Any]] = {}
+
+        self.j2cache = J2substTemplateCache(template_cache_size)
+
+        self.j2precompiled: J2substPrecompiled | None = None
+        if precompiled_path:
+            if os.path.exists(precompiled_path):
+                self.j2precompiled = J2substPrecompiled(precompiled_path)
+            else:
+                self.__warn('__init__', f'precompiled templates are not found: {repr(precompiled_path)}')
+
         ## make shallow copy of os.environ (for good)
-        # self.dict_env = os.environ
-        self.dict_env = { k: v for k, v in os.environ.items() if not is_env_skipped(k) }
+        self.dict_env = J2substEnvDict()
+
+        if self.mode == J2substMode.ENVSUBST:
+            ## Jinja2 is not used at all
+            self.envsubst = J2substEnvsubst(self.dict_env)
+            return
 
         j2ext = list(J2SUBST_JINJA_EXTENSIONS)
         if self.debug:
@@ -126,7 +296,15 @@ class J2subst:
             extensions=j2ext,
             ## dumb loader: does nothing by default
             loader=jinja2.DictLoader( { } ),
+            ## templates are not changed during run (see J2substTemplateCache)
+            auto_reload=False,
         )
+        ## see index_by()/group_by(), shared with environment overlays
+        setattr(self.j2env, J2SUBST_INDEX_CACHE_ATTR, J2substIndexCache())
+        ## see read_file() and friends, shared with environment overlays
+        setattr(self.j2env, J2SUBST_FILE_CACHE_ATTR, J2substFileCache())
+        ## see json_dumps()
+        self.j2env.policies['json.dumps_function'] = json_dumps
 
         for m in J2SUBST_PYTHON_MODULES:
             self.import_python_module(m)
@@ -166,11 +344,27 @@ class J2subst:
         for alias, f in J2SUBST_FUNCTION_ALIASES.items():
             self.import_function(f, alias)
 
+        if self.partial_eval:
+            self.j2partial = J2substPartial()
+            self.j2partial.set_namespace(self.dict_cfg_name, self.dict_cfg)
+            self.j2partial.set_namespace(self.dict_env_name, self.dict_env)
+
+        ## NB: after functions/filters are imported - they are used by template modules
+        for alias, t in (preload or {}).items():
+            if not (isinstance(alias, str) and isinstance(t, str)):
+                raise ValueError(f'not valid "preload": {repr( {alias: t} )}')
+            self.preload_template(t, alias)
+
     def __verify_dump_only(self):
         if not self.dump_only:
             return
         raise ValueError('"dump_only" is True')
 
+    def __verify_jinja_mode(self):
+        if self.mode == J2substMode.JINJA:
+            return
+        raise ValueError(f'"mode" is not {J2substMode.JINJA.name}')
+
     def __warn(self, source: str, message: str):
         if self.strict:
             raise ValueError(message)
@@ -193,24 +387,21 @@ class J2subst:
         def _info(msg: str):
             self.__info('merge_dict_default', msg)
 
+        if self.lazy_config:
+            self.__lazy_dict_default()
+            return
+
+        if self.compact_config:
+            ## share strings/subtrees between all configuration files
+            self.__compactor = J2substCompactor(self.freeze_config)
+            self.__compact_size = 0
+
         for p in self.config_path:
             if os.path.isfile(p):
                 if not self.merge_dict_from_file(p):
                     _warn(f'failed to load config file: {p}')
             elif os.path.isdir(p):
-                _entries: list[str] = []
-                for e in os.listdir(p):
-                    if e.startswith('.'):
-                        ## silently ignore hidden files
-                        continue
-                    ext = os.path.splitext(e)[1]
-                    if (not ext) or ext not in J2SUBST_CONFIG_EXT:
-                        ## silently ignore non-recognized extensions
-                        continue
-                    _entries.append(e)
-
-                for e in natsort.natsorted(_entries):
-                    f = os.path.join(p, e)
+                for f in self.__config_dir_files(p):
                     if not os.path.isfile(f):
                         continue
 
@@ -225,18 +416,143 @@ class J2subst:
             else:
                 _warn(f'not a file or directory, or does not exist: {p}')
 
+        if self.__compactor is not None:
+            self.__compactor = None
+            if self.__compact_size:
+                _info(f'configuration memory footprint: {self.__compact_size} bytes loaded, {deep_sizeof(self.dict_cfg)} bytes after compaction')
+
+        trees = self.__load_config_trees()
+        if trees:
+            cfg = dict(self.dict_cfg) | trees
+            self.dict_cfg = freeze(cfg) if self.freeze_config else cfg
+
+    @staticmethod
+    def __config_dir_files(path: str) -> list[str]:
+        _entries: list[str] = []
+        for e in os.listdir(path):
+            if e.startswith('.'):
+                ## silently ignore hidden files
+                continue
+            ext = os.path.splitext(e)[1]
+            if (not ext) or ext not in J2SUBST_CONFIG_EXT:
+                ## silently ignore non-recognized extensions
+                continue
+            _entries.append(e)
+
+        return [ os.path.join(path, e) for e in natsort.natsorted(_entries) ]
+
+    ## lazy mode: directory entries are named after top-level keys ("nginx.yml" defines only "nginx" key)
+    ## and are parsed only when key is accessed for the first time
+    def __lazy_dict_default(self):
+
+        def _warn(msg: str):
+            self.__warn('lazy_dict_default', msg)
+
+        ## top-level key -> sources in order of appearance:
+        ## either parsed document (file from "config_path") or file name (directory entry)
+        sources: dict[str, list[Any]] = {}
+
+        def _add_source(key: Any, source: Any):
+            if not isinstance(key, str):
+                _warn(f'not valid top-level key: {repr(key)}')
+                return
+            sources.setdefault(key, []).append(source)
+
+        for p in self.config_path:
+            if os.path.isfile(p):
+                if os.path.splitext(p)[1] not in J2SUBST_CONFIG_EXT:
+                    _warn(f'failed to load config file: {p}')
+                    continue
+                ## plain files are loaded immediately
+                for x in read_config_documents(p):
+                    if not is_map(x):
+                        _warn(f'not a mapping, skipping document in config file: {p}')
+                        continue
+                    for k in x:
+                        _add_source(k, x)
+            elif os.path.isdir(p):
+                for f in self.__config_dir_files(p):
+                    if not os.path.isfile(f):
+                        continue
+                    _add_source(os.path.splitext(os.path.basename(f))[0], f)
+            else:
+                _warn(f'not a file or directory, or does not exist: {p}')
+
+        compactor = J2substCompactor(self.freeze_config) if self.compact_config else None
+
+        def _thunk(key: str, key_sources: list[Any]) -> Callable[[], Any]:
+            return lambda: self.__lazy_value(key, key_sources, compactor)
+
+        thunks = { k: _thunk(k, v) for k, v in sources.items() }
+        for k, t in self.__load_config_trees().items():
+            thunks[k] = (lambda x=t: x)
+        self.dict_cfg = J2substLazyDict(thunks)
+
+        if self.strict:
+            ## reveal all configuration errors right now
+            self.dict_cfg.materialize()
+
+    ## config trees replace same top-level keys from regular configuration
+    def __load_config_trees(self) -> dict[str, J2substConfigTree]:
+        trees: dict[str, J2substConfigTree] = {}
+        for k, p in self.config_tree.items():
+            if not os.path.isdir(p):
+                self.__warn('load_config_trees', f'not a directory or does not exist: {p}')
+                continue
+            self.__info('load_config_trees', f'using config tree {p} as {repr(k)}')
+            trees[k] = J2substConfigTree(p)
+        self.config_trees = list(trees.values())
+        return trees
+
+    def __lazy_value(self, key: str, key_sources: list[Any], compactor: J2substCompactor | None) -> Any:
+
+        def _warn(msg: str):
+            self.__warn('lazy_value', msg)
+
+        def _info(msg: str):
+            self.__info('lazy_value', msg)
+
+        cfg: dict[str, Any] = {}
+        for src in key_sources:
+            if is_map(src):
+                cfg = merge_dict_recurse(cfg, { key: src[key] })
+                continue
+
+            _info(f'try loading {src}')
+            for x in read_config_documents(src):
+                if not is_map(x):
+                    _warn(f'not a mapping, skipping document in config file: {src}')
+                    continue
+                _extra = [ k for k in x if k != key ]
+                if _extra:
+                    _warn(f'config file defines unexpected top-level key(s) {repr(_extra)}, only {repr(key)} is expected: {src}')
+                if key in x:
+                    cfg = merge_dict_recurse(cfg, { key: x[key] })
+
+        if key not in cfg:
+            _warn(f'top-level key {repr(key)} is not defined in its config file(s)')
+            return None
+
+        x = cfg[key]
+        if compactor is not None:
+            x = compactor.compact(x)
+        if self.freeze_config:
+            x = freeze(x)
+        return x
+
     def __ensure_fs_loader_for(self, path: str | PathLike[str]) -> bool:
         if not os.path.isdir(path):
             return False
 
         p = str(path)
-        if p in self.j2fs_loaders:
-            return True
+        with self.__lock:
+            if p in self.j2fs_loaders:
+                return True
 
-        l = jinja2.FileSystemLoader(
-            path, encoding='utf-8', followlinks=True,
-        )
-        self.j2fs_loaders.update( { p: l } )
+            l = jinja2.FileSystemLoader(
+                path, encoding='utf-8', followlinks=True,
+            )
+            self.j2fs_loaders.update( { p: l } )
 
         return True
 
@@ -257,9 +573,11 @@ class J2subst:
 
         return self.__ensure_fs_loader_for(d)
 
-    def __resolve_origin(self, origin: str | PathLike[str] | None = None) -> tuple[str | None, bool]:
+    def __resolve_origin(self, origin: str | PathLike[str] | None = None, quiet: bool = False) -> tuple[str | None, bool]:
 
         def __warn(msg: str):
+            if quiet:
+                return
             self.__warn('__resolve_origin', msg)
 
         if origin is None:
@@ -285,19 +603,25 @@ class J2subst:
 
         return (_origin, _want_root)
 
-    def resolve_template_path(self, resolve_placeholders: bool, origin: str | PathLike[str] | None = None) -> list[str]:
+    def resolve_template_path(self, resolve_placeholders: bool, origin: str | PathLike[str] | None = None, quiet: bool = False) -> list[str]:
         self.__verify_dump_only()
 
         def __warn(msg: str):
+            if quiet:
+                return
             self.__warn('resolve_template_path', msg)
 
         def __info(msg: str):
+            if quiet:
+                return
             self.__info('resolve_template_path', msg)
 
         def __debug(msg: str):
+            if quiet:
+                return
             self.__debug('resolve_template_path', msg)
 
-        _origin, _want_root = self.__resolve_origin(origin)
+        _origin, _want_root = self.__resolve_origin(origin, quiet)
 
         # dirs: list[str | PathLike[str]] = []
         dirs: list[str] = []
@@ -344,11 +668,13 @@ class J2subst:
 
     def remove_global(self, name: str):
         self.__verify_dump_only()
+        self.__verify_jinja_mode()
 
         self.j2env.globals.pop(name, None)
 
     def remove_filter(self, name: str):
         self.__verify_dump_only()
+        self.__verify_jinja_mode()
 
         self.j2env.filters.pop(name, None)
 
@@ -357,6 +683,7 @@ class J2subst:
 
     def import_python_module(self, module_name: str, alias: str | None = None):
         self.__verify_dump_only()
+        self.__verify_jinja_mode()
 
         def __warn(msg: str):
             self.__warn('import_python_module', msg)
@@ -375,6 +702,7 @@ class J2subst:
 
     def import_filter(self, func: Any, alias: str | None = None):
         self.__verify_dump_only()
+        self.__verify_jinja_mode()
 
         if not callable(func):
             raise ValueError('func is not callable')
@@ -396,6 +724,7 @@ class J2subst:
 
     def import_builtin_function(self, func: Any, alias: str | None = None):
         self.__verify_dump_only()
+        self.__verify_jinja_mode()
 
         if not callable(func):
             raise ValueError('func is not callable')
@@ -414,6 +743,7 @@ class J2subst:
 
     def import_function(self, func: Any, alias: str | None = None):
         self.__verify_dump_only()
+        self.__verify_jinja_mode()
 
         if not callable(func):
             raise ValueError('func is not callable')
@@ -429,6 +759,46 @@ class J2subst:
             __warn(f'globals already has {repr(n)} key, function {repr(func.__name__)} will not be imported as {repr(n)}')
         self.__import_function(func, n)
 
+    ## template module (i.e. macros and top-level variables) is created once and shared by all templates,
+    ## same as '{% import "<template>" as <alias> %}' (without context) in every template.
+    ## NB: configuration/environment dictionaries are not available for template module unless passed as macro arguments.
+    def preload_template(self, template: str, alias: str):
+        self.__verify_dump_only()
+        self.__verify_jinja_mode()
+
+        def __warn(msg: str):
+            self.__warn('preload_template', msg)
+
+        if not is_plain_key(alias):
+            __warn(f'key is not "plain", template {repr(template)} will not be preloaded as {repr(alias)}')
+            return
+        if alias in self.j2env.globals:
+            __warn(f'globals already has {repr(alias)} key, template {repr(template)} will not be preloaded as {repr(alias)}')
+            return
+
+        ## NB: template module has no access to configuration/environment dictionaries, so nothing to fold
+        t = self.__get_template(template, specialize=False)
+        self.__info('preload_template', f'{repr(alias)} <- {t.filename or template}')
+        self.preloaded.append(os.path.realpath(t.filename) if t.filename else None)
+        self.__import_function(t.make_module(), alias)
+
+    def __merge_cfg(self, x: Any):
+        if self.compact_config:
+            if (self.verbosity > 0) or self.debug:
+                ## measure only if it's going to be reported
+                self.__compact_size += deep_sizeof(x)
+            x = (self.__compactor or J2substCompactor(self.freeze_config)).compact(x)
+
+        cfg = merge_dict_recurse(self.dict_cfg, x)
+        if self.freeze_config:
+            ## already frozen subtrees are reused as is
+            cfg = freeze(cfg)
+        self.dict_cfg = cfg
+
+        if (self.j2partial is not None) and not self.profiles:
+            ## keep folded configuration up to date (see load_profile())
+            self.j2partial.set_namespace(self.dict_cfg_name, self.dict_cfg)
+
     def merge_dict_from_yaml(self, filename: str | PathLike[str]):
         yaml_all_empty = True
         with open(filename, mode='r', encoding='utf-8') as fx:
@@ -436,7 +806,7 @@ class J2subst:
                 if not x:
                     continue
                 yaml_all_empty = False
-                self.dict_cfg = merge_dict_recurse(self.dict_cfg, x)
+                self.__merge_cfg(x)
 
         if yaml_all_empty:
             self.__info('merge_dict_from_yaml', f'received empty document(s) from: {repr(filename)}')
@@ -444,16 +814,16 @@ class J2subst:
     def merge_dict_from_toml(self, filename: str | PathLike[str]):
         with open(filename, mode='rb') as fx:
             x = tomllib.load(fx)
-            self.dict_cfg = merge_dict_recurse(self.dict_cfg, x)
+            self.__merge_cfg(x)
 
     def merge_dict_from_json(self, filename: str | PathLike[str]):
         with open(filename, mode='r', encoding='utf-8') as fx:
             x = json.load(fx)
-            self.dict_cfg = merge_dict_recurse(self.dict_cfg, x)
+            self.__merge_cfg(x)
 
     def merge_dict_from_json_str(self, string: str):
         x = json.loads(string)
-        self.dict_cfg = merge_dict_recurse(self.dict_cfg, x)
+        self.__merge_cfg(x)
 
     def merge_dict_from_file(self, filename: str | PathLike[str]) -> bool:
         if not filename:
@@ -487,12 +857,14 @@ class J2subst:
     def dump_config_yaml(self) -> str:
         if not self.dict_cfg:
             return J2SUBST_EMPTY_YAML
-        return yaml.safe_dump(self.dict_cfg, sort_keys=True)
+        ## pyyaml's safe dumper does not recognize subclasses of dict/tuple
+        return yaml.safe_dump(thaw(self.dict_cfg), sort_keys=True)
 
     def dump_config_json(self) -> str:
         if not self.dict_cfg:
             return J2SUBST_EMPTY_JSON
-        return json.dumps(self.dict_cfg, sort_keys=True)
+        ## NB: json does not recognize mappings other than dict
+        return json.dumps(thaw(self.dict_cfg), sort_keys=True)
 
     def dump_config(self, fmt: J2substDumpFormat = J2SUBST_DUMP_FORMAT) -> str:
         if fmt == J2substDumpFormat.YAML:
@@ -501,8 +873,9 @@ class J2subst:
             return self.dump_config_json()
         raise ValueError(f'unknown dump format: {repr(fmt)}')
 
-    def env_overlay(self, j2subst_origin: str | PathLike[str] | None = None, **kwargs: dict[str, Any]) -> jinja2.Environment:
+    def env_overlay(self, j2subst_origin: str | PathLike[str] | None = None, quiet: bool = False, **kwargs: dict[str, Any]) -> jinja2.Environment:
         self.__verify_dump_only()
+        self.__verify_jinja_mode()
 
         kw: dict[str, Any] = {}
         if kwargs:
@@ -512,7 +885,7 @@ class J2subst:
         if (_x is not None) and isinstance(_x, jinja2.BaseLoader):
             pass
         else:
-            dirs: list[str] = self.resolve_template_path(resolve_placeholders=True, origin=j2subst_origin)
+            dirs: list[str] = self.resolve_template_path(resolve_placeholders=True, origin=j2subst_origin, quiet=quiet)
 
             loader: jinja2.BaseLoader
             if dirs:
@@ -522,25 +895,47 @@ class J2subst:
             else:
                 loader=jinja2.DictLoader( { } )
 
-            kw.update( { 'loader': loader } )
+            kw.update( { 'loader': J2substLoader(loader, self.j2precompiled, self.j2partial, self.j2cache) } )
 
         return self.j2env.overlay(**kw)
 
-    def __prepare_kwargs(self, j2subst_file: str | None, j2subst_origin: str | None) -> dict[str, Any]:
+    def render_options(self, **kwargs: Any) -> J2substRenderOptions:
+        o = J2substRenderOptions(
+            allow_stdin_stdout=self.allow_stdin_stdout,
+            force=self.force,
+            unlink=self.unlink,
+        )
+        if kwargs:
+            o = dataclasses.replace(o, **kwargs)
+        return o
+
+    def __prepare_kwargs(self, j2subst_file: str | None, j2subst_origin: str | None, profile: str | None = None, options: J2substRenderOptions | None = None) -> dict[str, Any]:
+        ## pick up updates of config trees (if any)
+        for t in self.config_trees:
+            t.refresh()
+
         kw: dict[str, Any] = {
-            self.dict_cfg_name: self.dict_cfg,
+            self.dict_cfg_name: self.dict_cfg if profile is None else self.profiles[profile],
             self.dict_env_name: self.dict_env,
         }
+        if (options is not None) and options.context_root and j2subst_file:
+            kw.update(self.directory_context(os.path.dirname(j2subst_file), options.context_root, profile))
+        if (options is not None) and options.context:
+            ## NB: partial evaluation is not applied in this case (see __specialize())
+            kw.update(options.context)
         kw.update( {
             ## hardcoded:
             'is_ci': is_ci(),
             'j2subst_file': j2subst_file,
             'j2subst_origin': j2subst_origin,
+            'j2subst_profile': profile,
+            ## see J2substOutputExtension
+            'j2subst_emit': None,
         } )
 
         return kw
 
-    def render_str(self, string: str, j2env_overlay: jinja2.Environment | None = None) -> tuple[str, str | None]:
+    def render_str(self, string: str, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> tuple[str, str | None]:
         self.__verify_dump_only()
 
         _env = j2env_overlay
@@ -548,60 +943,391 @@ class J2subst:
             _env = self.env_overlay()
         t = _env.from_string(string)
 
-        kw = self.__prepare_kwargs(None, None)
+        kw = self.__prepare_kwargs(None, None, None, options)
 
         return t.render(**kw), None
 
-    def render_text_io(self, io_source: io.TextIOBase, j2env_overlay: jinja2.Environment | None = None) -> tuple[str, str | None]:
-        return self.render_str(''.join(io_source.readlines()), j2env_overlay)
+    def render_text_io(self, io_source: io.TextIOBase, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> tuple[str, str | None]:
+        return self.render_str(''.join(io_source.readlines()), j2env_overlay, options)
 
-    def render_from_file(self, filename: str, j2env_overlay: jinja2.Environment | None = None) -> tuple[str, str | None]:
-        self.__verify_dump_only()
+    ## "options" and "profiles" are used to decide whether partial evaluation may be applied (see __specialize()),
+    ## templates which are not rendered directly (e.g. directory context or preloaded modules) are never specialized
+    def __get_template(self, filename: str, j2env_overlay: jinja2.Environment | None = None, enable_async: bool = False, options: J2substRenderOptions | None = None, profiles: Sequence[str | None] | None = None, specialize: bool = True) -> jinja2.Template:
+        _env, source, f_in = self.__get_source(filename, j2env_overlay, enable_async)
+        return self.__compile_template(_env, filename, source, f_in, options, profiles, specialize)
 
-        def __debug(msg: str):
-            self.__debug('render_from_file', msg)
+    def __compile_template(self, env: jinja2.Environment, filename: str, source: str, f_in: str | None, options: J2substRenderOptions | None, profiles: Sequence[str | None] | None, specialize: bool) -> jinja2.Template:
+        if not isinstance(env.loader, J2substLoader):
+            ## custom environment
+            return env.get_template(filename)
+
+        _specialize = specialize and self.__specialize(f_in, options, profiles or [ None ])
+        return env.loader.load_source(env, filename, source, f_in, None, env.make_globals(None), _specialize)
+
+    ## partial evaluation is not applied if render context overrides folded names
+    ## (i.e. configuration/environment dictionaries)
+    def __specialize(self, f_in: str | None, options: J2substRenderOptions | None, profiles: Sequence[str | None]) -> bool:
+        if self.j2partial is None:
+            return False
+        if options is None:
+            return True
+
+        names = { self.dict_cfg_name, self.dict_env_name }
+        if options.context and (names & options.context.keys()):
+            return False
+        if options.context_root and f_in:
+            for p in profiles:
+                if names & self.directory_context(os.path.dirname(f_in), options.context_root, p).keys():
+                    return False
+        return True
+
+    ## same resolution as __get_template() but template is not compiled
+    def __get_source(self, filename: str, j2env_overlay: jinja2.Environment | None = None, enable_async: bool = False) -> tuple[jinja2.Environment, str, str | None]:
+        _kw: dict[str, Any] = {}
+        if enable_async:
+            _kw['enable_async'] = True
 
         _env = j2env_overlay
         if _env is None:
-            ## preserve internal settings
-            (_v, _d, _s) = (self.verbosity, self.debug, self.strict)
-            ## override internal settings for this call
-            (self.verbosity, self.debug, self.strict) = (-1, False, False)
-            _env = self.env_overlay()
-            ## restore internal settings
-            (self.verbosity, self.debug, self.strict) = (_v, _d, _s)
-
-            __debug('trying to resolve with self.env_overlay()')
+            _env = self.env_overlay(quiet=True, **_kw)
 
             ## TODO: avoid try-except
             try:
-                _env.get_template(filename)
+                source, f_in, _ = _env.loader.get_source(_env, filename)
+                return (_env, source, f_in)
             except jinja2.TemplateNotFound:
-                __debug(f'jinja2.TemplateNotFound: {repr(filename)}')
-                __debug(f'trying to resolve with self.env_overlay({repr(filename)})')
+                _env = self.env_overlay(filename, **_kw)
+
+        source, f_in, _ = _env.loader.get_source(_env, filename)
+        return (_env, source, f_in)
+
+    ## template source is read only once: template is either copied as is (template is None, see __is_passthrough()) or compiled from that source
+    def __load_file(self, filename: str, j2env_overlay: jinja2.Environment | None = None, enable_async: bool = False, options: J2substRenderOptions | None = None) -> tuple[jinja2.Environment, str, str | None, jinja2.Template | None]:
+        _env, source, f_in = self.__get_source(filename, j2env_overlay, enable_async)
+        if f_in and self.__is_passthrough(_env, source, f_in):
+            return (_env, source, f_in, None)
+
+        return (_env, source, f_in, self.__compile_template(_env, filename, source, f_in, options, None, True))
+
+    ## template without any Jinja2 syntax is rendered to itself
+    ## (except trailing newline, see jinja2.Environment.keep_trailing_newline)
+    @staticmethod
+    def __is_passthrough(env: jinja2.Environment, source: str, f_in: str) -> bool:
+        for d in [ env.block_start_string, env.variable_start_string, env.comment_start_string, env.line_statement_prefix, env.line_comment_prefix ]:
+            if d and (d in source):
+                return False
+        if (env.newline_sequence != '\n') and ('\n' in source):
+            return False
+
+        ## Jinja2 (and file loader) normalizes newlines, so look for CR in file itself
+        with open(f_in, mode='rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return True
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return m.find(b'\r') < 0
 
-                _env = self.env_overlay(filename)
+    def render_from_file(self, filename: str, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> tuple[str, str | None]:
+        self.__verify_dump_only()
 
-        t = _env.get_template(filename)
+        t = self.__get_template(filename, j2env_overlay, False, options)
         _origin, _ = self.__resolve_origin(t.filename)
 
-        kw = self.__prepare_kwargs(t.filename, _origin)
+        kw = self.__prepare_kwargs(t.filename, _origin, None, options)
 
         return t.render(**kw), t.filename
 
-    def render_stdin(self, j2env_overlay: jinja2.Environment | None = None) -> str:
+    @staticmethod
+    def __is_matrix(t: jinja2.Template) -> bool:
+        x = getattr(t, J2SUBST_FRONT_MATTER_ATTR, None)
+        return bool(x) and ('matrix' in x)
+
+    def __matrix_jobs(self, source: str, t: jinja2.Template, out_dir: str, profile: str | None, options: J2substRenderOptions) -> tuple[list[tuple[dict[str, Any], str]], bool]:
+
+        def __render_error(msg: str) -> tuple[list[tuple[dict[str, Any], str]], bool]:
+            self.__warn(source, msg)
+            return ([], False)
+
+        f_in = t.filename
+        spec = getattr(t, J2SUBST_FRONT_MATTER_ATTR)['matrix']
+        if not is_map(spec):
+            return __render_error(f'not valid matrix specification: {f_in}')
+
+        items_path = spec.get('items')
+        output = spec.get('output')
+        item_name = spec.get('item', J2SUBST_MATRIX_ITEM)
+        if not (items_path and isinstance(items_path, str)):
+            return __render_error(f'not valid matrix "items": {repr(items_path)}: {f_in}')
+        if not (output and isinstance(output, str)):
+            return __render_error(f'not valid matrix "output": {repr(output)}: {f_in}')
+        if not is_plain_key(item_name):
+            return __render_error(f'not valid matrix "item": {repr(item_name)}: {f_in}')
+
+        _origin, _ = self.__resolve_origin(f_in)
+        kw = self.__prepare_kwargs(f_in, _origin, profile, options)
+
+        ## "items" is dot-separated path within configuration
+        items: Any = kw[self.dict_cfg_name]
+        for k in str_split_to_list(items_path, '.'):
+            if is_map(items) and (k in items):
+                items = items[k]
+            elif is_seq(items) and k.isdigit() and (int(k) < len(items)):
+                items = items[int(k)]
+            else:
+                return __render_error(f'matrix "items" are not found: {repr(items_path)}: {f_in}')
+
+        pairs: list[tuple[Any, Any]]
+        if is_map(items):
+            pairs = list(items.items())
+        elif is_seq(items):
+            pairs = list(enumerate(items))
+        else:
+            return __render_error(f'matrix "items" are neither sequence nor mapping: {repr(items_path)}: {f_in}')
+
+        ## output name pattern is compiled only once (with synchronous environment)
+        t_out = self.j2env.from_string(output)
+
+        rv = True
+        jobs: list[tuple[dict[str, Any], str]] = []
+        seen: set[str] = set()
+        for key, item in pairs:
+            kw_item = kw | {
+                item_name: item,
+                'j2subst_matrix_key': key,
+            }
+
+            f_out = os.path.normpath(os.path.join(out_dir, t_out.render(**kw_item)))
+            if f_out in seen:
+                self.__warn(source, f'duplicate matrix output file: {f_out}')
+                rv = False
+                continue
+            seen.add(f_out)
+
+            jobs.append( (kw_item, f_out) )
+
+        return (jobs, rv)
+
+    ## nothing is written to filesystem with tar output
+    def __make_output_dir(self, f_out: str):
+        if self.output_tar is not None:
+            return
+        os.makedirs(os.path.dirname(f_out) or '.', exist_ok=True)
+
+    def __render_matrix(self, source: str, t: jinja2.Template, out_dir: str, profile: str | None, options: J2substRenderOptions) -> bool:
+        jobs, rv = self.__matrix_jobs(source, t, out_dir, profile, options)
+
+        ## template is compiled only once
+        for kw, f_out in jobs:
+            self.__make_output_dir(f_out)
+            rv &= self.__render_output(source, t, kw, f_out, options)
+
+        return rv
+
+    async def __render_matrix_async(self, source: str, t: jinja2.Template, out_dir: str, profile: str | None, options: J2substRenderOptions) -> bool:
+        jobs, rv = self.__matrix_jobs(source, t, out_dir, profile, options)
+
+        ## template is compiled only once
+        for kw, f_out in jobs:
+            await asyncio.to_thread(self.__make_output_dir, f_out)
+            rv &= await self.__render_output_async(source, t, kw, f_out, options)
+
+        return rv
+
+    def __emitter(self, source: str, f_in: str | None, out_dir: str, options: J2substRenderOptions, use_async: bool = False) -> tuple[Callable[[str, str], Any], list[bool]]:
+        emitted: list[bool] = []
+        seen: set[str] = set()
+
+        def __emit_target(path: str) -> str | None:
+            if is_stdout(path):
+                return '-'
+
+            f_out = os.path.normpath(os.path.join(out_dir, path))
+            if f_out in seen:
+                self.__warn(source, f'duplicate output file: {f_out}')
+                emitted.append(False)
+                return None
+            seen.add(f_out)
+
+            return f_out
+
+        def __emit(path: str, content: str):
+            f_out = __emit_target(path)
+            if f_out is None:
+                return
+            if f_out != '-':
+                self.__make_output_dir(f_out)
+
+            emitted.append(self.__write_output(source, content, f_in, f_out, options))
+
+        async def __emit_async(path: str, content: str):
+            f_out = __emit_target(path)
+            if f_out is None:
+                return
+            if f_out != '-':
+                await asyncio.to_thread(self.__make_output_dir, f_out)
+
+            emitted.append(await asyncio.to_thread(self.__write_output, source, content, f_in, f_out, options))
+
+        return (__emit_async if use_async else __emit, emitted)
+
+    @staticmethod
+    def __emit_dir(t: jinja2.Template, f_out: str) -> str:
+        if is_stdout(f_out):
+            return os.path.dirname(t.filename or '')
+        return os.path.dirname(f_out)
+
+    def __render_output(self, source: str, t: jinja2.Template, kw: dict[str, Any], f_out: str, options: J2substRenderOptions) -> bool:
+        f_in = t.filename
+
+        emit, emitted = self.__emitter(source, f_in, self.__emit_dir(t, f_out), options)
+        rendered = t.render(**(kw | { 'j2subst_emit': emit }))
+
+        if emitted and (not rendered.strip()):
+            ## template output was completely routed to files with "output" blocks
+            return all(emitted)
+
+        return self.__write_output(source, rendered, f_in, f_out, options) and all(emitted)
+
+    async def __render_output_async(self, source: str, t: jinja2.Template, kw: dict[str, Any], f_out: str, options: J2substRenderOptions) -> bool:
+        f_in = t.filename
+
+        emit, emitted = self.__emitter(source, f_in, self.__emit_dir(t, f_out), options, use_async=True)
+        rendered = await t.render_async(**(kw | { 'j2subst_emit': emit }))
+
+        if emitted and (not rendered.strip()):
+            ## template output was completely routed to files with "output" blocks
+            return all(emitted)
+
+        r = await asyncio.to_thread(self.__write_output, source, rendered, f_in, f_out, options)
+        return r and all(emitted)
+
+    def render_stdin(self, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> str:
         self.__verify_dump_only()
 
-        r, _ = self.render_text_io(sys.stdin, j2env_overlay)
+        r, _ = self.render_text_io(sys.stdin, j2env_overlay, options)
         return r
 
-    def render_file(self, file_in: str | PathLike[str], file_out: str | PathLike[str] | None = None, j2env_overlay: jinja2.Environment | None = None) -> bool:
+    def __output_name(self, source: str, file_in: str | PathLike[str], f_in: str | None) -> str | None:
+
+        def __warn(msg: str):
+            self.__warn(source, msg)
+
+        if f_in is None:
+            __warn('unable to determine output file name')
+            return None
+        if not f_in.endswith(J2SUBST_TEMPLATE_EXT):
+            __warn(f'input file name extension mismatch: {repr(file_in)}')
+            return None
+        return os.path.splitext(f_in)[0]
+
+    ## "rendered" is either text or stream of bytes chunks
+    def __write_output(self, source: str, rendered: str | Iterable[bytes], f_in: str | None, f_out: str, options: J2substRenderOptions) -> bool:
+
+        def __render_error(msg: str) -> bool:
+            self.__warn(source, msg)
+            return False
+
+        if is_stdout(f_out):
+            if not options.allow_stdin_stdout:
+                return __render_error('stdout not allowed')
+            if (self.output_tar is not None) and (self.output_tar.path == '-'):
+                return __render_error('stdout is used by tar output')
+
+            if isinstance(rendered, str):
+                sys.stdout.write(rendered)
+                sys.stdout.flush()
+            else:
+                sys.stdout.flush()
+                for c in rendered:
+                    sys.stdout.buffer.write(c)
+                sys.stdout.buffer.flush()
+
+            return True
+
+        if self.output_tar is not None:
+            ## filesystem is not touched at all
+            try:
+                self.output_tar.add(f_out, rendered.encode('utf-8') if isinstance(rendered, str) else rendered, options.force)
+            except J2substOutputError as e:
+                return __render_error(str(e))
+            return True
+
+        ## safety measures are done by write_file_atomic()
+        try:
+            if isinstance(rendered, str):
+                write_file_atomic(f_out, rendered.encode('utf-8'), f_in, options.force)
+            else:
+                write_chunks_atomic(f_out, rendered, f_in, options.force)
+        except J2substOutputError as e:
+            return __render_error(str(e))
+
+        self.__output_written(f_out)
+        return True
+
+    def __output_written(self, f_out: str):
+        with self.__lock:
+            self.__written.add(os.path.abspath(f_out))
+
+    ## hits/misses/evictions of compiled templates cache
+    def template_cache_stats(self) -> dict[str, int]:
+        return self.j2cache.stats()
+
+    ## finish tar output (if any)
+    def close_outputs(self) -> bool:
+        if self.output_tar is None:
+            return True
+        try:
+            self.output_tar.close()
+        except OSError as e:
+            self.__warn('close_outputs', f'unable to finish tar output: {e}')
+            return False
+        finally:
+            self.output_tar = None
+        return True
+
+    ## flush all written output files (and their directories) to disk at once
+    def sync_outputs(self):
+        with self.__lock:
+            files = sorted(self.__written)
+            self.__written = set()
+
+        ## NB: os.sync() flushes all filesystems, so only written files are flushed
+        dirs: set[str] = set()
+        for f in files:
+            dirs.add(os.path.dirname(f))
+            try:
+                fsync_path(f)
+            except OSError as e:
+                self.__warn('sync_outputs', f'unable to flush output file {f}: {e}')
+        for d in sorted(dirs):
+            try:
+                fsync_path(d, directory=True)
+            except OSError as e:
+                self.__warn('sync_outputs', f'unable to flush directory {d}: {e}')
+
+    def __unlink_template(self, source: str, f_in: str | None, f_stdin: bool, options: J2substRenderOptions):
+        if not options.unlink:
+            return
+        if f_stdin:
+            self.__info(source, 'cannot unlink() stdin')
+        elif f_in:
+            os.unlink(f_in)
+
+    def render_file(self, file_in: str | PathLike[str], file_out: str | PathLike[str] | None = None, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> bool:
         self.__verify_dump_only()
 
-        rendered: str
-        f_in: str | None = None
-        f_stdin: bool = False
+        if not self.is_changed(file_in, file_out):
+            return True
+
+        t0 = time.perf_counter()
+        r = self.__render_file(file_in, file_out, j2env_overlay, options)
+        if r:
+            self.__record_timing(file_in, t0)
+        return r
+
+    def __render_file(self, file_in: str | PathLike[str], file_out: str | PathLike[str] | None = None, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> bool:
+
         f_out: str | None = None
+        _opts = options or self.render_options()
 
         def __warn(msg: str):
             self.__warn('render_file', msg)
@@ -610,106 +1336,442 @@ class J2subst:
             __warn(msg)
             return False
 
-        def __info(msg: str):
-            self.__info('render_file', msg)
-
-        def __debug(msg: str):
-            self.__debug('render_file', msg)
+        if self.mode == J2substMode.ENVSUBST:
+            return self.__envsubst_file(file_in, file_out, _opts)
 
         if is_stdin(file_in):
-            if not self.allow_stdin_stdout:
+            if not _opts.allow_stdin_stdout:
                 return __render_error('stdin not allowed')
-            f_stdin = True
-            rendered = self.render_stdin(j2env_overlay)
-        else:
-            rendered, f_in = self.render_from_file(str(file_in), j2env_overlay)
+
+            f_out = '-' if file_out is None else str(file_out)
+            if not self.__write_output('render_file', self.render_stdin(j2env_overlay, _opts), None, f_out, _opts):
+                return False
+
+            self.__unlink_template('render_file', None, True, _opts)
+            return True
+
+        _env, source, f_in, t = self.__load_file(str(file_in), j2env_overlay, False, _opts)
+        if t is None:
+            ## fastpath: copy template as is
+            return self.__passthrough_file(source, file_in, str(f_in), file_out, _env, _opts)
+
+        f_in = t.filename
+
+        if self.__is_matrix(t):
+            if file_out is not None:
+                return __render_error(f'matrix template does not support explicit output file name: {repr(file_in)}')
+            if not self.__render_matrix('render_file', t, os.path.dirname(f_in), None, _opts):
+                return False
+
+            self.__unlink_template('render_file', f_in, False, _opts)
+            return True
 
         if file_out is None:
-            if f_stdin:
-                f_out = '-'
-            else:
-                if f_in is None:
-                    return __render_error('unable to determine output file name')
-                if not f_in.endswith(J2SUBST_TEMPLATE_EXT):
-                    return __render_error(f'input file name extension mismatch: {repr(file_in)}')
-                f_out = os.path.splitext(f_in)[0]
+            f_out = self.__output_name('render_file', file_in, f_in)
         else:
             f_out = str(file_out)
 
         ## safety measures
         if f_out is None:
-            return __render_error('unable to determine output file name')
+            return False
 
-        if is_stdout(f_out):
-            if not self.allow_stdin_stdout:
-                return __render_error('stdout not allowed')
+        _origin, _ = self.__resolve_origin(f_in)
+        kw = self.__prepare_kwargs(f_in, _origin, None, _opts)
+        if not self.__render_output('render_file', t, kw, f_out, _opts):
+            return False
 
-            sys.stdout.write(rendered)
-            sys.stdout.flush()
+        self.__unlink_template('render_file', f_in, False, _opts)
 
-            if self.unlink:
-                if f_stdin:
-                    __info('cannot unlink() stdin')
-                elif f_in:
-                    os.unlink(f_in)
+        return True
+
+    def __envsubst_file(self, file_in: str | PathLike[str], file_out: str | PathLike[str] | None, options: J2substRenderOptions) -> bool:
+
+        def __render_error(msg: str) -> bool:
+            self.__warn('render_file', msg)
+            return False
+
+        if is_stdin(file_in):
+            if not options.allow_stdin_stdout:
+                return __render_error('stdin not allowed')
 
+            f_out = '-' if file_out is None else str(file_out)
+            if not self.__write_output('render_file', self.envsubst.stream(sys.stdin.buffer), None, f_out, options):
+                return False
+
+            self.__unlink_template('render_file', None, True, options)
             return True
 
-        ## TODO: there're still TOCTOU windows
+        ## NB: template path is not used in this mode
+        f_in = os.path.normpath(file_in)
+        if not os.path.isfile(f_in):
+            return __render_error(f'not a file or does not exist: {repr(file_in)}')
+
+        f_out: str | None = None
+        if file_out is None:
+            f_out = self.__output_name('render_file', file_in, f_in)
+        else:
+            f_out = str(file_out)
 
         ## safety measures
-        if os.path.islink(f_out):
-            return __render_error(f'output file is symlink: {f_out}')
-        if os.path.exists(f_out):
-            if not os.path.isfile(f_out):
-                return __render_error(f'output file is not a file: {f_out}')
-            if f_in and os.path.samefile(f_in, f_out):
-                return __render_error(f'unable to process template inplace: {f_in}')
-            if not self.force:
-                return __render_error(f'unable to overwrite existing file: {f_out}')
-
-            os.unlink(f_out)
-
-        with open(f_out, mode='w', encoding='utf-8') as f:
-            f.reconfigure(write_through=True)
-            f.write(rendered)
-            f.flush()
-
-        if self.unlink:
-            if f_stdin:
-                __info('cannot unlink() stdin')
-            elif f_in:
-                os.unlink(f_in)
+        if f_out is None:
+            return False
+
+        with open(f_in, mode='rb') as f:
+            if not self.__write_output('render_file', self.envsubst.stream(f), f_in, f_out, options):
+                return False
 
+        self.__unlink_template('render_file', f_in, False, options)
         return True
 
-    def render_directory(self, directory: str | PathLike[str], depth: int = 1, j2env_overlay: jinja2.Environment | None = None) -> bool:
+    def __passthrough_file(self, source: str, file_in: str | PathLike[str], f_in: str, file_out: str | PathLike[str] | None, env: jinja2.Environment, options: J2substRenderOptions) -> bool:
+
+        def __render_error(msg: str) -> bool:
+            self.__warn('render_file', msg)
+            return False
+
+        f_out: str | None = None
+        if file_out is None:
+            f_out = self.__output_name('render_file', file_in, f_in)
+        else:
+            f_out = str(file_out)
+
+        ## safety measures
+        if f_out is None:
+            return False
+
+        strip = (not env.keep_trailing_newline) and source.endswith('\n')
+
+        if (self.output_tar is not None) or is_stdout(f_out):
+            if not self.__write_output('render_file', source[:-1] if strip else source, f_in, f_out, options):
+                return False
+        else:
+            self.__debug('render_file', f'passthrough: {f_in}')
+            try:
+                copy_file_atomic(f_out, f_in, options.force, 1 if strip else 0)
+            except J2substOutputError as e:
+                return __render_error(str(e))
+            self.__output_written(f_out)
+
+        self.__unlink_template('render_file', f_in, False, options)
+        return True
+
+    async def render_str_async(self, string: str, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> tuple[str, str | None]:
+        self.__verify_dump_only()
+
+        _env = j2env_overlay
+        if _env is None:
+            _env = self.env_overlay(enable_async=True)
+        t = _env.from_string(string)
+
+        kw = self.__prepare_kwargs(None, None, None, options)
+
+        return await t.render_async(**kw), None
+
+    async def render_from_file_async(self, filename: str, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> tuple[str, str | None]:
+        self.__verify_dump_only()
+
+        t = await asyncio.to_thread(self.__get_template, filename, j2env_overlay, True, options)
+        _origin, _ = self.__resolve_origin(t.filename)
+
+        kw = self.__prepare_kwargs(t.filename, _origin, None, options)
+
+        return await t.render_async(**kw), t.filename
+
+    async def render_file_async(self, file_in: str | PathLike[str], file_out: str | PathLike[str] | None = None, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> bool:
         self.__verify_dump_only()
 
+        if not await asyncio.to_thread(self.is_changed, file_in, file_out):
+            return True
+
+        f_out: str | None = None
+        _opts = options or self.render_options()
+
         def __warn(msg: str):
-            self.__warn('render_directory', msg)
+            self.__warn('render_file_async', msg)
 
         def __render_error(msg: str) -> bool:
             __warn(msg)
             return False
 
-        def __info(msg: str):
-            self.__info('render_directory', msg)
+        if self.mode == J2substMode.ENVSUBST:
+            ## Jinja2 is not used at all, substitution is streamed
+            return await asyncio.to_thread(self.__envsubst_file, file_in, file_out, _opts)
 
-        def __debug(msg: str):
-            self.__debug('render_directory', msg)
+        if is_stdin(file_in):
+            if not _opts.allow_stdin_stdout:
+                return __render_error('stdin not allowed')
+
+            string = await asyncio.to_thread(sys.stdin.read)
+            rendered, _ = await self.render_str_async(string, j2env_overlay, _opts)
+
+            f_out = '-' if file_out is None else str(file_out)
+            if not await asyncio.to_thread(self.__write_output, 'render_file_async', rendered, None, f_out, _opts):
+                return False
+
+            self.__unlink_template('render_file_async', None, True, _opts)
+            return True
+
+        ## template lookup and compilation are offloaded too
+        _env, source, f_in, t = await asyncio.to_thread(self.__load_file, str(file_in), j2env_overlay, True, _opts)
+        if t is None:
+            ## fastpath: copy template as is
+            return await asyncio.to_thread(self.__passthrough_file, source, file_in, str(f_in), file_out, _env, _opts)
+
+        f_in = t.filename
+
+        if self.__is_matrix(t):
+            if file_out is not None:
+                return __render_error(f'matrix template does not support explicit output file name: {repr(file_in)}')
+            if not await self.__render_matrix_async('render_file_async', t, os.path.dirname(f_in), None, _opts):
+                return False
+
+            await asyncio.to_thread(self.__unlink_template, 'render_file_async', f_in, False, _opts)
+            return True
+
+        if file_out is None:
+            f_out = self.__output_name('render_file_async', file_in, f_in)
+        else:
+            f_out = str(file_out)
+
+        ## safety measures
+        if f_out is None:
+            return False
+
+        _origin, _ = self.__resolve_origin(f_in)
+        kw = self.__prepare_kwargs(f_in, _origin, None, _opts)
+        if not await self.__render_output_async('render_file_async', t, kw, f_out, _opts):
+            return False
+
+        await asyncio.to_thread(self.__unlink_template, 'render_file_async', f_in, False, _opts)
+
+        return True
+
+    async def render_directory_async(self, directory: str | PathLike[str], depth: int = 1, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None, concurrency: int = J2SUBST_ASYNC_CONCURRENCY) -> bool:
+        self.__verify_dump_only()
+
+        def __warn(msg: str):
+            self.__warn('render_directory_async', msg)
+
+        if not await asyncio.to_thread(os.path.isdir, directory):
+            __warn(f'not a directory: {repr(directory)}')
+            return False
+
+        _opts = self.__with_context_root(options, directory)
+
+        templates: list[str] = await asyncio.to_thread(lambda: list(self.schedule_templates(self.iter_templates(directory, depth))))
+
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def __render(f: str) -> bool:
+            async with sem:
+                return await self.render_file_async(f, None, j2env_overlay, _opts)
+
+        ## results are aggregated in order of templates
+        results = await asyncio.gather(*[__render(f) for f in templates], return_exceptions=True)
+
+        errors: list[Exception] = []
+        rv = True
+        for f, r in zip(templates, results):
+            if isinstance(r, Exception):
+                r.add_note(f'J2subst: render_directory_async: {f}')
+                errors.append(r)
+                continue
+            if isinstance(r, BaseException):
+                raise r
+            rv &= r
+
+        if errors:
+            raise ExceptionGroup(f'J2subst: render_directory_async: {len(errors)} template(s) failed', errors)
+
+        return rv
+
+    def load_profile(self, name: str, config_path: Sequence[str | PathLike[str]]):
+        self.__verify_dump_only()
+
+        if not (isinstance(name, str) and re.fullmatch(r'[a-zA-Z0-9_][a-zA-Z0-9_.-]*', name)):
+            raise ValueError(f'not valid profile name: {repr(name)}')
+        if name in self.profiles:
+            raise ValueError(f'duplicate profile name: {repr(name)}')
+
+        ## configuration from "config_path" is common for all profiles
+        j = J2subst(dump_only=True,
+            verbosity=self.verbosity,
+            debug=self.debug,
+            strict=self.strict,
+            config_path=self.config_path + non_empty_str(config_path),
+            freeze_config=self.freeze_config,
+            compact_config=self.compact_config,
+            lazy_config=self.lazy_config,
+            config_tree=self.config_tree,
+        )
+        self.profiles[name] = j.dict_cfg
+        if self.j2partial is not None:
+            ## configuration differs between profiles, so it can't be folded anymore
+            self.j2partial.set_namespace(self.dict_cfg_name, None)
+        self.config_trees += j.config_trees
+        self.profile_config_path += non_empty_str(config_path)
+
+    def render_file_profiles(self, file_in: str | PathLike[str], output_dir: str | PathLike[str], base_dir: str | PathLike[str] | None = None, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> dict[str, bool]:
+        self.__verify_dump_only()
+
+        ## outputs of profiles are not checked
+        if not self.is_changed(file_in, os.devnull):
+            return { p: True for p in self.profiles }
+
+        t0 = time.perf_counter()
+        r = self.__render_file_profiles(file_in, output_dir, base_dir, j2env_overlay, options)
+        if r and all(r.values()):
+            self.__record_timing(file_in, t0)
+        return r
+
+    def __render_file_profiles(self, file_in: str | PathLike[str], output_dir: str | PathLike[str], base_dir: str | PathLike[str] | None = None, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> dict[str, bool]:
+
+        _opts = options or self.render_options()
+
+        def __warn(msg: str):
+            self.__warn('render_file_profiles', msg)
+
+        rv: dict[str, bool] = { p: False for p in self.profiles }
+
+        _output_dir = str(output_dir)
+        if (len(self.profiles) > 1) and (_output_dir.find('@{PROFILE}') < 0):
+            __warn(f'output directory does not contain "@{{PROFILE}}" placeholder: {repr(_output_dir)}')
+            return rv
+
+        ## template is compiled only once
+        t = self.__get_template(str(file_in), j2env_overlay, False, _opts, list(self.profiles))
+        f_in = t.filename
+
+        name = self.__output_name('render_file_profiles', file_in, f_in)
+        if name is None:
+            return rv
+
+        if base_dir is None:
+            name = os.path.basename(name)
+        else:
+            name = os.path.relpath(name, base_dir)
+            if name.startswith('..'):
+                __warn(f'output file is outside of base directory: {repr(name)}')
+                return rv
+
+        _origin, _ = self.__resolve_origin(f_in)
+
+        _matrix = self.__is_matrix(t)
+
+        for p in self.profiles:
+            f_out = os.path.join(_output_dir.replace('@{PROFILE}', p), name)
+            if _matrix:
+                rv[p] = self.__render_matrix('render_file_profiles', t, os.path.dirname(f_out), p, _opts)
+                continue
+
+            self.__make_output_dir(f_out)
+
+            kw = self.__prepare_kwargs(f_in, _origin, p, _opts)
+            rv[p] = self.__render_output('render_file_profiles', t, kw, f_out, _opts)
+
+        if all(rv.values()):
+            self.__unlink_template('render_file_profiles', f_in, False, _opts)
+
+        return rv
+
+    def render_directory_profiles(self, directory: str | PathLike[str], output_dir: str | PathLike[str], depth: int = 1, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None) -> dict[str, bool]:
+        self.__verify_dump_only()
+
+        def __warn(msg: str):
+            self.__warn('render_directory_profiles', msg)
+
+        rv: dict[str, bool] = { p: True for p in self.profiles }
 
         if not os.path.isdir(directory):
-            return __render_error(f'not a directory: {repr(directory)}')
+            __warn(f'not a directory: {repr(directory)}')
+            return { p: False for p in self.profiles }
+
+        _opts = self.__with_context_root(options, directory)
+        for f in self.iter_templates(directory, depth):
+            r = self.render_file_profiles(f, output_dir, directory, j2env_overlay, _opts)
+            for p in self.profiles:
+                rv[p] &= r[p]
+
+        return rv
+
+    def __with_context_root(self, options: J2substRenderOptions | None, directory: str | PathLike[str]) -> J2substRenderOptions:
+        _opts = options or self.render_options()
+        if _opts.context_root is None:
+            _opts = dataclasses.replace(_opts, context_root=str(directory))
+        return _opts
+
+    @staticmethod
+    def __dir_context_files(directory: str) -> list[str]:
+        ## data files first, so context template may use their variables
+        names = [ J2SUBST_DIR_CONTEXT + ext for ext in J2SUBST_CONFIG_EXT ] + [ J2SUBST_DIR_CONTEXT + J2SUBST_TEMPLATE_EXT ]
+        return [ os.path.join(directory, n) for n in names ]
+
+    ## variables shared by all templates within "directory" (and below), computed once per directory:
+    ## "_context.yml" (and other configuration formats) provide variables as is,
+    ## "_context.j2" is evaluated as template and its top-level variables/macros are exported.
+    ## context of parent directory (up to "root") is inherited.
+    def directory_context(self, directory: str | PathLike[str], root: str | PathLike[str], profile: str | None = None) -> Mapping[str, Any]:
+        self.__verify_dump_only()
+
+        d = os.path.abspath(directory)
+        _root = os.path.abspath(root)
+        if (d != _root) and not d.startswith(_root + os.sep):
+            return {}
+
+        key = (d, _root, profile)
+        with self.__lock:
+            x = self.__dir_contexts.get(key)
+            if x is not None:
+                return x
+
+            ctx: dict[str, Any] = {}
+            if d != _root:
+                ctx.update(self.directory_context(os.path.dirname(d), _root, profile))
+
+            for f in self.__dir_context_files(d):
+                if not os.path.isfile(f):
+                    continue
+                self.__info('directory_context', f'loading {f}')
+                if f.endswith(J2SUBST_TEMPLATE_EXT):
+                    ctx.update(self.__eval_context_template(f, ctx, profile))
+                    continue
+                for doc in read_config_documents(f):
+                    if not is_map(doc):
+                        self.__warn('directory_context', f'not a mapping, skipping document in context file: {f}')
+                        continue
+                    ctx.update(doc)
+
+            self.__dir_contexts[key] = ctx
+            return ctx
+
+    def __eval_context_template(self, filename: str, parent: Mapping[str, Any], profile: str | None) -> dict[str, Any]:
+        t = self.__get_template(filename, specialize=False)
+        _origin, _ = self.__resolve_origin(t.filename)
+
+        kw = self.__prepare_kwargs(t.filename, _origin, profile)
+        kw.update(parent)
+
+        ## render template body only for side effects: top-level "set" and "macro"
+        c = t.new_context(kw)
+        for _ in t.root_render_func(c):
+            pass
+        return c.get_exported()
+
+    def iter_templates(self, directory: str | PathLike[str], depth: int = 1) -> Iterator[str]:
+        self.__verify_dump_only()
+
+        def __info(msg: str):
+            self.__info('iter_templates', msg)
+
+        def __debug(msg: str):
+            self.__debug('iter_templates', msg)
 
         ## minor adjustments
         if depth < 0:
             depth = -1
         if depth == 0:
             __debug('depth == 0')
-            return True
-
-        rv = True
+            return
 
         _entries: list[str] = []
         for e in os.listdir(directory):
@@ -723,17 +1785,371 @@ class J2subst:
 
             if os.path.isdir(p):
                 if depth < 0:
-                    rv &= self.render_directory(p, depth, j2env_overlay)
+                    yield from self.iter_templates(p, depth)
                 else:
-                    rv &= self.render_directory(p, depth - 1, j2env_overlay)
+                    yield from self.iter_templates(p, depth - 1)
+                continue
+
+            if e == J2SUBST_DIR_CONTEXT + J2SUBST_TEMPLATE_EXT:
+                ## see directory_context()
                 continue
 
             if e.endswith(J2SUBST_TEMPLATE_EXT) and os.path.isfile(p):
-                rv &= self.render_file(p, None, j2env_overlay)
+                yield p
                 continue
 
             __info(f'ignore: {e}')
 
+    ## changed files since git commit "changed_since" (None if it's not possible to decide)
+    def __get_changes(self) -> J2substGitChanges | None:
+        with self.__lock:
+            if self.__changes_ready:
+                return self.__changes
+            self.__changes_ready = True
+
+            try:
+                self.__changes = J2substGitChanges(str(self.changed_since))
+            except (ValueError, OSError) as e:
+                self.__warn('is_changed', f'unable to get changes since {repr(self.changed_since)}, rendering all templates: {e}')
+                return None
+
+            if self.j2precompiled is not None:
+                self.__warn('is_changed', 'precompiled templates are used, rendering all templates')
+                self.__changes = None
+                return None
+
+            if self.mode != J2substMode.ENVSUBST:
+                self.__changed_cfg_keys = self.__get_changed_cfg_keys(self.__changes)
+            return self.__changes
+
+    ## top-level configuration keys affected by changes (None if any key may be affected)
+    def __get_changed_cfg_keys(self, changes: J2substGitChanges) -> set[str] | None:
+
+        def __info(msg: str):
+            self.__info('is_changed', msg)
+
+        files: set[str] = set()
+        dirs: set[str] = set()
+        for p in self.config_path + self.profile_config_path:
+            if os.path.isdir(p):
+                dirs.add(os.path.realpath(p))
+            else:
+                files.add(os.path.realpath(p))
+        for p in files:
+            if os.path.exists(p) and not changes.is_tracked(p):
+                __info(f'config file is not tracked by git: {p}')
+                return None
+        for p in dirs:
+            for f in self.__config_dir_files(p):
+                if not changes.is_tracked(f):
+                    __info(f'config file is not tracked by git: {f}')
+                    return None
+
+        trees = { k: os.path.realpath(p) for k, p in self.config_tree.items() }
+
+        keys: set[str] = set()
+        for f in changes.files:
+            for k, p in trees.items():
+                if f.startswith(p + os.sep):
+                    keys.add(k)
+
+            d, name = os.path.split(f)
+            if f in files:
+                pass
+            elif (d in dirs) and (not name.startswith('.')) and (os.path.splitext(name)[1] in J2SUBST_CONFIG_EXT):
+                if self.lazy_config:
+                    ## see __lazy_dict_default()
+                    keys.add(os.path.splitext(name)[0])
+                    continue
+            else:
+                continue
+
+            try:
+                keys |= changes.changed_config_keys(f)
+            except (ValueError, OSError) as e:
+                __info(f'unable to compare config file {f}: {e}')
+                return None
+
+        __info(f'changed top-level configuration keys: {sorted(keys)}')
+        return keys
+
+    def __get_template_deps(self, filename: str) -> tuple[list[str | None], set[str] | None, bool]:
+        with self.__lock:
+            x = self.__template_deps.get(filename)
+        if x is not None:
+            return x
+
+        with open(filename, mode='r', encoding='utf-8') as f:
+            source = f.read()
+        ast = self.j2env.parse(source)
+        keys = template_config_keys(ast, self.dict_cfg_name)
+        if front_matter(self.j2env, source) is not None:
+            ## e.g. matrix items are taken from configuration
+            keys = None
+        x = (list(jinja2.meta.find_referenced_templates(ast)), keys, template_reads_files(ast))
+
+        with self.__lock:
+            self.__template_deps[filename] = x
+        return x
+
+    ## with "changed_since": returns False if template (or any of included/imported templates, or configuration used by them)
+    ## is known to be unchanged since git commit "changed_since" and output file exists, so rendering may be skipped.
+    ## templates reading files (e.g. with read_file()) are always rendered.
+    ## changes of environment variables and Python modules are not tracked.
+    def is_changed(self, file_in: str | PathLike[str], file_out: str | PathLike[str] | None = None) -> bool:
+
+        def __info(msg: str):
+            self.__info('is_changed', msg)
+
+        if (self.changed_since is None) or is_stdin(file_in):
+            return True
+        if self.output_tar is not None:
+            ## existing output files are not part of tar archive
+            return True
+
+        changes = self.__get_changes()
+        if changes is None:
+            return True
+
+        f_in = str(file_in)
+        f_out = str(file_out) if file_out else None
+        if (f_out is None) and f_in.endswith(J2SUBST_TEMPLATE_EXT):
+            f_out = os.path.splitext(f_in)[0]
+        if (f_out is None) or not (os.path.exists(f_out) or is_stdout(f_out)):
+            return True
+
+        if self.mode == J2substMode.ENVSUBST:
+            return (not changes.is_tracked(f_in)) or changes.is_changed(f_in)
+
+        queue = [ os.path.realpath(f_in) ]
+        ## per-directory contexts (see directory_context()) of all parent directories within repository
+        d = os.path.dirname(queue[0])
+        while (d == changes.toplevel) or d.startswith(changes.toplevel + os.sep):
+            for f in self.__dir_context_files(d):
+                ## also catches removed ones
+                if changes.is_changed(f):
+                    __info(f'changed: {f}')
+                    return True
+                if not os.path.isfile(f):
+                    continue
+                if f.endswith(J2SUBST_TEMPLATE_EXT):
+                    queue.append(f)
+                elif not changes.is_tracked(f):
+                    __info(f'changed: {f}')
+                    return True
+            if d == changes.toplevel:
+                break
+            d = os.path.dirname(d)
+
+        ## preloaded templates (and templates referenced by them) are available to every template
+        for f in self.preloaded:
+            if f is None:
+                __info(f'preloaded template is not loaded from file, unable to decide: {f_in}')
+                return True
+            queue.append(f)
+
+        seen: set[str] = set()
+        while queue:
+            f = queue.pop(0)
+            if f in seen:
+                continue
+            seen.add(f)
+
+            if (not changes.is_tracked(f)) or changes.is_changed(f):
+                __info(f'changed: {f}')
+                return True
+
+            ## TODO: avoid try-except
+            try:
+                refs, keys, reads = self.__get_template_deps(f)
+            except (jinja2.TemplateSyntaxError, OSError, UnicodeDecodeError):
+                ## let rendering report error
+                return True
+
+            if reads:
+                __info(f'template reads files, unable to decide: {f}')
+                return True
+
+            if is_config_affected(keys, self.__changed_cfg_keys):
+                __info(f'configuration is changed: {f}')
+                return True
+
+            _env = self.env_overlay(f, quiet=True)
+            for ref in refs:
+                if ref is None:
+                    __info(f'dynamic template reference, unable to decide: {f}')
+                    return True
+                ## TODO: avoid try-except
+                try:
+                    _, ref_f, _ = _env.loader.get_source(_env, ref)
+                except jinja2.TemplateNotFound:
+                    return True
+                if not ref_f:
+                    return True
+                queue.append(os.path.realpath(ref_f))
+
+        __info(f'unchanged since {self.changed_since}: {f_in}')
+        return False
+
+    ## most expensive templates first (only if timing history is used)
+    def schedule_templates(self, templates: Iterable[str]) -> Iterable[str]:
+        if self.timing is None:
+            return templates
+
+        files = { os.path.relpath(f): f for f in templates }
+        costs = self.timing.estimate(files)
+        return [ files[k] for k in order_by_cost(list(files), costs) ]
+
+    ## failed renders are not recorded: they are usually much faster than successful ones
+    def __record_timing(self, file_in: str | PathLike[str], t0: float):
+        if (self.timing is None) or is_stdin(file_in):
+            return
+        self.timing.record(os.path.relpath(file_in), time.perf_counter() - t0)
+
+    def save_timing_history(self) -> bool:
+        if self.timing is None:
+            return True
+        try:
+            self.timing.save()
+        except (J2substOutputError, OSError) as e:
+            self.__warn('save_timing_history', f'unable to write timing history: {e}')
+            return False
+        return True
+
+    ## split templates found in "paths" between "shards" deterministically
+    ## (every caller gets the same complete plan regardless of its own shard)
+    def plan_shards(self, paths: Iterable[str | PathLike[str]], depth: int, shards: int) -> list[J2substShardItem]:
+        self.__verify_dump_only()
+
+        def __warn(msg: str):
+            self.__warn('plan_shards', msg)
+
+        found: dict[str, tuple[str, str | None]] = {}
+        for p in paths:
+            if os.path.isdir(p):
+                for f in self.iter_templates(p, depth):
+                    found.setdefault(os.path.relpath(f), (f, str(p)))
+            elif os.path.isfile(p):
+                found.setdefault(os.path.relpath(p), (str(p), None))
+            else:
+                __warn(f'not a file or directory, or does not exist: {repr(p)}')
+
+        keys = sorted(found)
+        costs: dict[str, float] | None = None
+        if (self.shard_costs is not None) and self.shard_costs.durations:
+            ## NB: estimates depend only on shared inputs (costs file and template files)
+            costs = self.shard_costs.estimate({ k: f for k, (f, _) in found.items() })
+            keys = order_by_cost(keys, costs)
+
+        owners = assign_shards(keys, shards, costs)
+
+        items: list[J2substShardItem] = []
+        for k in keys:
+            f, base_dir = found[k]
+            output = None
+            if k.endswith(J2SUBST_TEMPLATE_EXT):
+                output = os.path.splitext(k)[0]
+            items.append(J2substShardItem(f, base_dir, k, output, owners[k]))
+        return items
+
+    def write_shard_manifest(self, path: str | PathLike[str], items: Sequence[J2substShardItem], shards: int) -> bool:
+        ## manifest is (re)written unconditionally
+        try:
+            write_file_atomic(str(path), shard_manifest(items, shards).encode('utf-8'), None, True)
+        except (J2substOutputError, OSError) as e:
+            self.__warn('write_shard_manifest', f'unable to write shard manifest: {e}')
+            return False
+        return True
+
+    def render_directory(self, directory: str | PathLike[str], depth: int = 1, j2env_overlay: jinja2.Environment | None = None, options: J2substRenderOptions | None = None, shard: tuple[int, int] | None = None) -> bool:
+        self.__verify_dump_only()
+
+        def __warn(msg: str):
+            self.__warn('render_directory', msg)
+
+        def __render_error(msg: str) -> bool:
+            __warn(msg)
+            return False
+
+        if not os.path.isdir(directory):
+            return __render_error(f'not a directory: {repr(directory)}')
+
+        rv = True
+
+        _templates: Iterable[str]
+        if shard is None:
+            _templates = self.schedule_templates(self.iter_templates(directory, depth))
+        else:
+            ## only templates of this shard
+            _templates = [ i.template for i in self.plan_shards([directory], depth, shard[1]) if i.shard == shard[0] ]
+
+        _opts = self.__with_context_root(options, directory)
+        for p in _templates:
+            rv &= self.render_file(p, None, j2env_overlay, _opts)
+
+        return rv
+
+    def compile_templates(self, target: str | PathLike[str], paths: Iterable[str | PathLike[str]], depth: int = 1) -> bool:
+        self.__verify_dump_only()
+        self.__verify_jinja_mode()
+
+        def __warn(msg: str):
+            self.__warn('compile_templates', msg)
+
+        def __info(msg: str):
+            self.__info('compile_templates', msg)
+
+        rv = True
+
+        queue: list[str] = []
+        for p in paths:
+            if os.path.isdir(p):
+                queue.extend(self.iter_templates(p, depth))
+            elif os.path.isfile(p):
+                queue.append(str(p))
+            else:
+                __warn(f'not a file or directory, or does not exist: {repr(p)}')
+                rv = False
+
+        seen: set[str] = set()
+        w = J2substPrecompiledWriter(target)
+        try:
+            while queue:
+                f = os.path.realpath(queue.pop(0))
+                if f in seen:
+                    continue
+                seen.add(f)
+
+                with open(f, mode='r', encoding='utf-8') as fx:
+                    source = fx.read()
+
+                ## TODO: avoid try-except
+                try:
+                    code = J2substPrecompiled.compile_module(self.j2env, source, f)
+                except jinja2.TemplateSyntaxError as e:
+                    __warn(f'failed to compile template: {f}: {e}')
+                    rv = False
+                    continue
+
+                __info(f'compiled {f} as {w.write(f, code)}')
+
+                ## also compile templates referenced by include/import/extends
+                _env = self.env_overlay(f)
+                for ref in jinja2.meta.find_referenced_templates(self.j2env.parse(source)):
+                    if ref is None:
+                        ## dynamic reference, unable to resolve
+                        continue
+                    ## TODO: avoid try-except
+                    try:
+                        _, ref_f, _ = _env.loader.get_source(_env, ref)
+                    except jinja2.TemplateNotFound:
+                        __info(f'unable to resolve {repr(ref)} referenced from {f}')
+                        continue
+                    if ref_f:
+                        queue.append(ref_f)
+        finally:
+            w.close()
+
         return rv
 
     def handle_simple_cli_args(self, arg1: str | PathLike[str], arg2: str | PathLike[str] | None = None) -> tuple[str | None, str | None]:
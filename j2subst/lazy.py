@@ -0,0 +1,90 @@
+import json
+import os
+import os.path
+import threading
+import tomllib
+
+from collections.abc import (
+    Callable,
+    Iterator,
+    Mapping,
+)
+from os import (
+    PathLike,
+)
+from typing import (
+    Any,
+)
+
+## pyyaml
+import yaml
+
+## this module
+from .frozen import J2substFrozenDict
+from .functions import is_env_skipped
+
+
+## non-empty documents from configuration file
+def read_config_documents(filename: str | PathLike[str]) -> list[Any]:
+    with open(filename, mode='rb') as fx:
+        return parse_config_documents(filename, fx.read())
+
+
+## same as read_config_documents() but for file contents (e.g. from git)
+def parse_config_documents(filename: str | PathLike[str], data: bytes) -> list[Any]:
+    ext = os.path.splitext(filename)[1]
+    if ext in [ '.yml', '.yaml' ]:
+        return [ x for x in yaml.safe_load_all(data.decode('utf-8')) if x ]
+    if ext == '.toml':
+        return [ tomllib.loads(data.decode('utf-8')) ]
+    if ext == '.json':
+        return [ json.loads(data.decode('utf-8')) ]
+    raise ValueError(f'non-recognized name extension: {repr(filename)}')
+
+
+## read-only mapping: values are evaluated on first access and then cached
+class J2substLazyDict(Mapping[str, Any]):
+
+    def __init__(self, thunks: Mapping[str, Callable[[], Any]]):
+        self.__thunks = dict(thunks)
+        self.__values: dict[str, Any] = {}
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.__values:
+            ## fastpath
+            return self.__values[key]
+
+        thunk = self.__thunks[key]
+        with self.__lock:
+            if key not in self.__values:
+                self.__values[key] = thunk()
+            return self.__values[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__thunks
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__thunks)
+
+    def __len__(self) -> int:
+        return len(self.__thunks)
+
+    def __repr__(self) -> str:
+        return repr(self.materialize())
+
+    def evaluated(self) -> list[str]:
+        return [ k for k in self.__thunks if k in self.__values ]
+
+    def materialize(self) -> dict[str, Any]:
+        return { k: self[k] for k in self.__thunks }
+
+
+## read-only filtered copy of environment (see is_env_skipped()):
+## it's regular dict (subclass), so it's serializable as is (e.g. "{{ env | tojson }}")
+class J2substEnvDict(J2substFrozenDict):
+    __slots__ = ()
+
+    def __init__(self, environ: Mapping[str, str] | None = None):
+        environ = os.environ if environ is None else environ
+        super().__init__((k, v) for k, v in environ.items() if not is_env_skipped(k))
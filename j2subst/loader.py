@@ -0,0 +1,210 @@
+import hashlib
+import os
+import os.path
+import re
+import sys
+import threading
+import zipfile
+
+from collections.abc import (
+    Callable,
+    MutableMapping,
+)
+from os import (
+    PathLike,
+)
+from types import (
+    ModuleType,
+)
+from typing import (
+    Any,
+)
+
+## jinja2
+import jinja2
+import jinja2.utils
+## pyyaml
+import yaml
+
+## this module
+from .cache import J2substTemplateCache
+from .partial import J2substPartial
+
+
+J2SUBST_PRECOMPILED_SOURCE_HASH = 'j2subst_source_sha256'
+J2SUBST_PRECOMPILED_JINJA_VERSION = 'j2subst_jinja_version'
+
+J2SUBST_FRONT_MATTER_ATTR = 'j2subst_front_matter'
+J2SUBST_FRONT_MATTER_MARKER = 'j2subst'
+
+
+def source_sha256(source: str) -> str:
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+## front matter is YAML document within leading template comment:
+##   {#- j2subst
+##   matrix:
+##     items: services
+##   -#}
+def front_matter(environment: jinja2.Environment, source: str) -> dict[str, Any] | None:
+    c_start = re.escape(environment.comment_start_string)
+    if not re.match(r'\s*' + c_start, source):
+        ## fastpath
+        return None
+
+    c_end = re.escape(environment.comment_end_string)
+    m = re.match(r'\s*' + c_start + r'[-+]?[ \t]*' + J2SUBST_FRONT_MATTER_MARKER + r'[ \t]*\n(.*?)[-+]?' + c_end, source, re.DOTALL)
+    if m is None:
+        return None
+
+    x = yaml.safe_load(m.group(1))
+    if not isinstance(x, dict):
+        return None
+    return x
+
+
+class J2substPrecompiled:
+
+    def __init__(self, path: str | PathLike[str]):
+        self.path = str(path)
+        self.modules: dict[str, ModuleType | None] = {}
+        self.loader = jinja2.ModuleLoader(self.path)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def module_key(filename: str) -> str:
+        return jinja2.ModuleLoader.get_template_key(os.path.realpath(filename))
+
+    def __import_module(self, key: str) -> ModuleType | None:
+        with self.lock:
+            return self.__import_module_locked(key)
+
+    def __import_module_locked(self, key: str) -> ModuleType | None:
+        if key in self.modules:
+            return self.modules[key]
+
+        module = f'{self.loader.package_name}.{key}'
+        mod: ModuleType | None
+        ## TODO: avoid try-except
+        try:
+            mod = __import__(module, None, None, ['root'])
+        except ImportError:
+            mod = None
+
+        ## same as jinja2.ModuleLoader: keep module only in our own cache
+        sys.modules.pop(module, None)
+
+        self.modules[key] = mod
+        return mod
+
+    def load(self, environment: jinja2.Environment, source: str, filename: str, globals: MutableMapping[str, Any]) -> jinja2.Template | None:
+        ## modules are compiled for sync rendering only: let async environment compile template
+        if environment.is_async:
+            return None
+
+        mod = self.__import_module(self.module_key(filename))
+        if mod is None:
+            return None
+
+        ## stale module: template source was changed after compilation
+        if getattr(mod, J2SUBST_PRECOMPILED_SOURCE_HASH, None) != source_sha256(source):
+            return None
+        ## module was compiled by another version of jinja2
+        if getattr(mod, J2SUBST_PRECOMPILED_JINJA_VERSION, None) != jinja2.__version__:
+            return None
+
+        return environment.template_class.from_module_dict(environment, mod.__dict__, globals)
+
+    @staticmethod
+    def compile_module(environment: jinja2.Environment, source: str, filename: str) -> str:
+        code = environment.compile(source, os.path.realpath(filename), filename, raw=True, defer_init=True)
+        return '\n'.join([
+            code,
+            f'{J2SUBST_PRECOMPILED_SOURCE_HASH} = {repr(source_sha256(source))}',
+            f'{J2SUBST_PRECOMPILED_JINJA_VERSION} = {repr(jinja2.__version__)}',
+            '',
+        ])
+
+
+class J2substPrecompiledWriter:
+
+    def __init__(self, target: str | PathLike[str]):
+        self.target = str(target)
+        self.zip: zipfile.ZipFile | None = None
+
+        if self.target.endswith('.zip'):
+            self.zip = zipfile.ZipFile(self.target, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            os.makedirs(self.target, exist_ok=True)
+
+    def write(self, filename: str, module_code: str) -> str:
+        name = J2substPrecompiled.module_key(filename) + '.py'
+        if self.zip is not None:
+            info = zipfile.ZipInfo(name)
+            info.external_attr = 0o644 << 16
+            self.zip.writestr(info, module_code)
+        else:
+            with open(os.path.join(self.target, name), mode='w', encoding='utf-8') as f:
+                f.write(module_code)
+        return name
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+            self.zip = None
+
+
+class J2substLoader(jinja2.BaseLoader):
+
+    def __init__(self, loader: jinja2.BaseLoader, precompiled: J2substPrecompiled | None = None, partial: J2substPartial | None = None, cache: J2substTemplateCache | None = None):
+        self.loader = loader
+        self.precompiled = precompiled
+        self.partial = partial
+        self.cache = cache
+
+    def get_source(self, environment: jinja2.Environment, template: str) -> tuple[str, str | None, Callable[[], bool] | None]:
+        return self.loader.get_source(environment, template)
+
+    def list_templates(self) -> list[str]:
+        return self.loader.list_templates()
+
+    @jinja2.utils.internalcode
+    def load(self, environment: jinja2.Environment, name: str, globals: MutableMapping[str, Any] | None = None) -> jinja2.Template:
+        source, filename, uptodate = self.get_source(environment, name)
+        return self.load_source(environment, name, source, filename, uptodate, globals)
+
+    ## same as load() but template source is already read by caller.
+    ## partial evaluation (if any) is applied only with "specialize", i.e. for templates rendered directly:
+    ## included/imported templates may see names rebound by caller (e.g. '{% set cfg = ... %}{% include ... %}')
+    def load_source(self, environment: jinja2.Environment, name: str, source: str, filename: str | None, uptodate: Callable[[], bool] | None = None, globals: MutableMapping[str, Any] | None = None, specialize: bool = False) -> jinja2.Template:
+        if globals is None:
+            globals = {}
+
+        t: jinja2.Template | None = None
+
+        if (self.precompiled is not None) and filename:
+            t = self.precompiled.load(environment, source, filename, globals)
+            if t is not None:
+                ## module namespace refers to precompiled module file, fix this
+                t.name = name
+                t.filename = filename
+                # pylint: disable=W0212
+                t._uptodate = uptodate
+
+        if t is None:
+            partial = self.partial if specialize else None
+            if self.cache is not None:
+                code = self.cache.compile(environment, source, name, filename, partial)
+            elif partial is not None:
+                code = partial.compile(environment, source, name, filename)
+            else:
+                code = environment.compile(source, name, filename)
+            t = environment.template_class.from_code(environment, code, globals, uptodate)
+            if self.cache is not None:
+                ## code may be shared between templates with same content
+                t.name = name
+                t.filename = filename
+
+        setattr(t, J2SUBST_FRONT_MATTER_ATTR, front_matter(environment, source))
+        return t
@@ -0,0 +1,6 @@
+import enum
+
+## NB: modes must be listed in upper case
+class J2substMode(enum.Enum):
+    JINJA = enum.auto()
+    ENVSUBST = enum.auto()
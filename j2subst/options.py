@@ -0,0 +1,20 @@
+import dataclasses
+
+from collections.abc import (
+    Mapping,
+)
+from typing import (
+    Any,
+)
+
+
+## per-call rendering options: instances are immutable and may be shared between threads
+@dataclasses.dataclass(frozen=True)
+class J2substRenderOptions:
+    allow_stdin_stdout: bool = True
+    force: bool = False
+    unlink: bool = False
+    ## extra template variables for this call
+    context: Mapping[str, Any] | None = None
+    ## directory where per-directory contexts start from (see J2subst.directory_context())
+    context_root: str | None = None
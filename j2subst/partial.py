@@ -0,0 +1,135 @@
+import threading
+
+from types import (
+    CodeType,
+)
+from typing import (
+    Any,
+)
+
+## Jinja2
+import jinja2
+import jinja2.nodes
+import jinja2.visitor
+from jinja2.compiler import has_safe_repr
+
+## this module
+from .frozen import thaw
+from .tree import (
+    J2substConfigTree,
+    J2substConfigTreeNode,
+)
+
+
+## folded values are embedded into compiled template code, so they are limited in size
+J2SUBST_PARTIAL_MAX_REPR = 4096
+
+
+## partial evaluation: lookups like "cfg.a.b" and "env['HOME']" are replaced with constants at compile time.
+## it's up to Jinja2 optimizer to fold further expressions with constant arguments (e.g. filters).
+## namespaces must not change during run (i.e. configuration must be read-only).
+class J2substPartial:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        ## name -> value (e.g. "cfg" -> configuration)
+        self.namespaces: dict[str, Any] = {}
+        ## bumped on every namespace change: compiled code is cached by generation
+        ## instead of (expensive) hash of configuration (see J2substTemplateCache)
+        self.generation = 0
+        self.folded = 0
+
+    def set_namespace(self, name: str, value: Any | None):
+        with self.lock:
+            if value is None:
+                self.namespaces.pop(name, None)
+            else:
+                self.namespaces[name] = value
+            self.generation += 1
+
+    def compile(self, environment: jinja2.Environment, source: str, name: str | None, filename: str | None) -> CodeType:
+        with self.lock:
+            namespaces = dict(self.namespaces)
+
+        e = J2substPartialEvaluator(environment, namespaces)
+        ast = e.visit(environment.parse(source, name, filename))
+        code = environment.compile(ast, name, filename)
+
+        with self.lock:
+            self.folded += e.folded
+        return code
+
+
+class J2substPartialEvaluator(jinja2.visitor.NodeTransformer):
+
+    def __init__(self, environment: jinja2.Environment, namespaces: dict[str, Any]):
+        self.environment = environment
+        self.namespaces = namespaces
+        self.folded = 0
+
+    def visit_Template(self, node: jinja2.nodes.Template) -> jinja2.nodes.Node:
+        ## blocks are rendered within context of parent template which may rebind any name
+        if node.find(jinja2.nodes.Extends) is not None:
+            return node
+
+        ## names which are (re)defined within template (e.g. loop variables) are not folded at all
+        shadowed: set[str] = set()
+        for n in node.find_all((jinja2.nodes.Name, jinja2.nodes.Import, jinja2.nodes.FromImport)):
+            if isinstance(n, jinja2.nodes.Name):
+                if n.ctx != 'load':
+                    shadowed.add(n.name)
+            elif isinstance(n, jinja2.nodes.Import):
+                shadowed.add(n.target)
+            else:
+                for x in n.names:
+                    shadowed.add(x[1] if isinstance(x, tuple) else x)
+
+        self.namespaces = { k: v for k, v in self.namespaces.items() if k not in shadowed }
+        if not self.namespaces:
+            return node
+        return self.generic_visit(node)
+
+    def __resolve(self, node: jinja2.nodes.Node) -> tuple[bool, Any]:
+        x: Any
+        if isinstance(node, jinja2.nodes.Name):
+            if (node.ctx != 'load') or (node.name not in self.namespaces):
+                return (False, None)
+            x = self.namespaces[node.name]
+        elif isinstance(node, jinja2.nodes.Getattr):
+            ok, v = self.__resolve(node.node)
+            if not ok:
+                return (False, None)
+            x = self.environment.getattr(v, node.attr)
+        elif isinstance(node, jinja2.nodes.Getitem) and isinstance(node.arg, jinja2.nodes.Const):
+            ok, v = self.__resolve(node.node)
+            if not ok:
+                return (False, None)
+            x = self.environment.getitem(v, node.arg.value)
+        else:
+            return (False, None)
+
+        if isinstance(x, jinja2.Undefined):
+            ## keep runtime behavior (e.g. error message)
+            return (False, None)
+        if isinstance(x, (J2substConfigTree, J2substConfigTreeNode)):
+            ## config trees may change during run
+            return (False, None)
+        return (True, x)
+
+    def __fold(self, node: jinja2.nodes.Node) -> jinja2.nodes.Node:
+        ok, x = self.__resolve(node)
+        if ok:
+            x = thaw(x)
+            if has_safe_repr(x) and (len(repr(x)) <= J2SUBST_PARTIAL_MAX_REPR):
+                self.folded += 1
+                return jinja2.nodes.Const(x, lineno=node.lineno, environment=self.environment)
+        return self.generic_visit(node)
+
+    def visit_Name(self, node: jinja2.nodes.Name) -> jinja2.nodes.Node:
+        return self.__fold(node)
+
+    def visit_Getattr(self, node: jinja2.nodes.Getattr) -> jinja2.nodes.Node:
+        return self.__fold(node)
+
+    def visit_Getitem(self, node: jinja2.nodes.Getitem) -> jinja2.nodes.Node:
+        return self.__fold(node)
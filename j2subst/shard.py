@@ -0,0 +1,78 @@
+import dataclasses
+import hashlib
+import heapq
+import json
+import re
+
+from collections.abc import (
+    Mapping,
+    Sequence,
+)
+
+
+## template assigned to shard
+@dataclasses.dataclass(frozen=True)
+class J2substShardItem:
+    ## template file name to render
+    template: str
+    ## directory argument which template was discovered in (if any)
+    base_dir: str | None
+    ## stable identity: path relative to current working directory
+    key: str
+    ## expected output file name (relative to current working directory)
+    output: str | None
+    ## 1-based shard number
+    shard: int
+
+
+## "K/N" -> (K, N), 1 <= K <= N
+def parse_shard(x: str) -> tuple[int, int]:
+    m = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', x)
+    if m is None:
+        raise ValueError(f'not valid shard specification: {repr(x)}')
+    k, n = int(m.group(1)), int(m.group(2))
+    if not (1 <= k <= n):
+        raise ValueError(f'not valid shard specification: {repr(x)}')
+    return (k, n)
+
+
+## stable across runs, hosts and Python versions (unlike hash())
+def shard_of(key: str, shards: int) -> int:
+    h = hashlib.sha256(key.encode('utf-8')).digest()
+    return 1 + (int.from_bytes(h[:8], 'big') % shards)
+
+
+## most expensive first (ties are broken by key)
+def order_by_cost(keys: Sequence[str], costs: Mapping[str, float]) -> list[str]:
+    return sorted(keys, key=lambda k: (-costs[k], k))
+
+
+## without costs: stable hash of key,
+## otherwise: greedy bin packing (most expensive template goes to least loaded shard).
+## NB: costs must be the same for every caller (i.e. computed from shared inputs only), otherwise plans differ
+def assign_shards(keys: Sequence[str], shards: int, costs: Mapping[str, float] | None = None) -> dict[str, int]:
+    if costs is None:
+        return { k: shard_of(k, shards) for k in keys }
+
+    rv: dict[str, int] = {}
+    loads = [ (0.0, s) for s in range(1, shards + 1) ]
+    for k in order_by_cost(keys, costs):
+        load, s = heapq.heappop(loads)
+        rv[k] = s
+        heapq.heappush(loads, (load + costs[k], s))
+    return rv
+
+
+def shard_manifest(items: Sequence[J2substShardItem], shards: int) -> str:
+    x = {
+        'shards': shards,
+        'templates': [
+            {
+                'template': i.key,
+                'output': i.output,
+                'shard': i.shard,
+            }
+            for i in sorted(items, key=lambda i: i.key)
+        ],
+    }
+    return json.dumps(x, indent=2, sort_keys=True) + '\n'
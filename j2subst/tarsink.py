@@ -0,0 +1,93 @@
+import io
+import os
+import os.path
+import sys
+import tarfile
+import threading
+import time
+
+from collections.abc import (
+    Iterable,
+)
+from os import (
+    PathLike,
+)
+from typing import (
+    BinaryIO,
+)
+
+## this module
+from .writer import J2substOutputError
+
+
+## SOURCE_DATE_EPOCH (None if not set), raises ValueError if it's not valid
+## ref: https://reproducible-builds.org/specs/source-date-epoch/
+def source_date_epoch() -> int | None:
+    x = os.environ.get('SOURCE_DATE_EPOCH')
+    if not x:
+        return None
+    if not (x.isascii() and x.isdigit()):
+        raise ValueError(f'SOURCE_DATE_EPOCH is not valid (non-negative integer is expected): {repr(x)}')
+    return int(x)
+
+
+## output files are streamed into tar archive ("-" is stdout) instead of being written to filesystem:
+## member name is output file name relative to current working directory,
+## mode is the same as for regular output file (i.e. with umask applied),
+## mtime is fixed (e.g. taken from SOURCE_DATE_EPOCH, see source_date_epoch()) for reproducible archives.
+class J2substTarSink:
+
+    def __init__(self, path: str | PathLike[str], mtime: int | None = None):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        ## member names written so far
+        self.names: set[str] = set()
+
+        ## NB: os.umask() is the only way to get current umask
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.mode = 0o666 & ~umask
+
+        self.mtime = mtime
+
+        self.__file: BinaryIO | None = None
+        if self.path == '-':
+            sys.stdout.flush()
+            self.tar = tarfile.open(fileobj=sys.stdout.buffer, mode='w|', format=tarfile.PAX_FORMAT)
+        else:
+            self.__file = open(self.path, mode='wb')
+            self.tar = tarfile.open(fileobj=self.__file, mode='w|', format=tarfile.PAX_FORMAT)
+
+    @staticmethod
+    def member_name(f_out: str) -> str:
+        name = os.path.relpath(f_out)
+        if os.path.isabs(name) or (name == os.pardir) or name.startswith(os.pardir + os.sep):
+            raise J2substOutputError(f'output file is outside of current directory: {f_out}')
+        return name.replace(os.sep, '/')
+
+    ## "data" is either bytes or stream of bytes chunks
+    def add(self, f_out: str, data: bytes | Iterable[bytes], force: bool = False):
+        name = self.member_name(f_out)
+        if not isinstance(data, bytes):
+            data = b''.join(data)
+
+        ti = tarfile.TarInfo(name)
+        ti.size = len(data)
+        ti.mode = self.mode
+        ti.mtime = int(time.time()) if self.mtime is None else self.mtime
+
+        with self.lock:
+            if name in self.names:
+                if not force:
+                    raise J2substOutputError(f'unable to overwrite existing tar member: {name}')
+                ## NB: later member wins on extraction
+            self.names.add(name)
+            self.tar.addfile(ti, io.BytesIO(data))
+
+    def close(self):
+        with self.lock:
+            self.tar.close()
+            if self.__file is None:
+                sys.stdout.buffer.flush()
+            else:
+                self.__file.close()
@@ -0,0 +1,24 @@
+from pathlib import Path
+
+## this module
+from j2subst import J2subst
+
+
+## the same source compiled under environments with different syntax must not share compiled code
+def test_cache_overlays_with_different_delimiters(tmp_path: Path):
+    f = tmp_path / 'd.txt.j2'
+    f.write_text('{{ 1 + 1 }} [[ 2 + 2 ]]', encoding='utf-8')
+
+    j = J2subst()
+    default = j.env_overlay(str(tmp_path))
+    brackets = j.env_overlay(str(tmp_path), variable_start_string='[[', variable_end_string=']]')
+
+    for _ in range(2):
+        text, _ = j.render_from_file(str(f), j2env_overlay=default)
+        assert text == '2 [[ 2 + 2 ]]'
+        text, _ = j.render_from_file(str(f), j2env_overlay=brackets)
+        assert text == '{{ 1 + 1 }} 4'
+
+    stats = j.template_cache_stats()
+    assert stats['misses'] == 2
+    assert stats['hits'] == 2
@@ -0,0 +1,19 @@
+import json
+
+## this module
+from j2subst import J2subst
+
+
+def test_env_tojson(monkeypatch):
+    monkeypatch.setenv('J2SUBST_TEST_VALUE', 'x')
+    monkeypatch.setenv('TEST_VALUE', 'y')
+    monkeypatch.setenv('_', 'z')
+
+    j = J2subst()
+    text, _ = j.render_str('{{ env | tojson }}')
+    x = json.loads(text)
+
+    assert x['TEST_VALUE'] == 'y'
+    assert 'J2SUBST_TEST_VALUE' not in x
+    assert '_' not in x
+    assert json.loads(json.dumps(j.dict_env)) == x
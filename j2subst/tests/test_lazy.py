@@ -0,0 +1,20 @@
+import json
+
+from pathlib import Path
+
+## this module
+from j2subst import J2subst
+
+
+def test_lazy_config_tojson(tmp_path: Path):
+    cfg = tmp_path / 'config'
+    cfg.mkdir()
+    (cfg / 'nginx.yml').write_text('nginx:\n  port: 80\n', encoding='utf-8')
+    (cfg / 'users.json').write_text('{"users": [ "a", "b" ]}', encoding='utf-8')
+
+    j = J2subst(config_path=[str(cfg)], lazy_config=True)
+    text, _ = j.render_str('{{ cfg | tojson }}')
+    assert json.loads(text) == { 'nginx': { 'port': 80 }, 'users': [ 'a', 'b' ] }
+
+    text, _ = j.render_str('{{ { "x": cfg } | tojson }}')
+    assert json.loads(text) == { 'x': { 'nginx': { 'port': 80 }, 'users': [ 'a', 'b' ] } }
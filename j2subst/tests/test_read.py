@@ -0,0 +1,36 @@
+import os
+
+from pathlib import Path
+
+## this module
+from j2subst import J2subst
+
+
+def test_read_file_cache_per_instance(tmp_path: Path):
+    f = tmp_path / 'data.json'
+    f.write_text('{"a": 1}', encoding='utf-8')
+    tpl = f'{{{{ read_json("{f}").a }}}}'
+
+    j1 = J2subst()
+    assert j1.render_str(tpl)[0] == '1'
+
+    ## same size and mtime: cached value is reused by the same instance
+    st = f.stat()
+    f.write_text('{"a": 2}', encoding='utf-8')
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert j1.render_str(tpl)[0] == '1'
+
+    ## but not by another one
+    j2 = J2subst()
+    assert j2.render_str(tpl)[0] == '2'
+
+
+def test_read_file_changed(tmp_path: Path):
+    f = tmp_path / 'data.txt'
+    f.write_text('one', encoding='utf-8')
+    tpl = f'{{{{ read_file("{f}") }}}}'
+
+    j = J2subst()
+    assert j.render_str(tpl)[0] == 'one'
+    f.write_text('three', encoding='utf-8')
+    assert j.render_str(tpl)[0] == 'three'
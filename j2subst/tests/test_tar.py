@@ -0,0 +1,46 @@
+import os
+import tarfile
+
+from pathlib import Path
+
+import pytest
+
+## this module
+from j2subst import J2subst
+
+
+def __render_tar(tmp_path: Path, **kwargs) -> tarfile.TarInfo:
+    (tmp_path / 'a.txt.j2').write_text('{{ 1 + 1 }}\n', encoding='utf-8')
+    archive = tmp_path / 'out.tar'
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        j = J2subst(output_tar=str(archive), **kwargs)
+        assert j.render_file('a.txt.j2', options=j.render_options(allow_stdin_stdout=False))
+        assert j.close_outputs()
+    finally:
+        os.chdir(cwd)
+
+    with tarfile.open(archive) as tar:
+        return tar.getmember('a.txt')
+
+
+def test_tar_source_date_epoch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    assert __render_tar(tmp_path).mtime == 1700000000
+
+
+@pytest.mark.parametrize('value', [ 'yesterday', '-1', '1.5' ])
+def test_tar_source_date_epoch_not_valid(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], value: str):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', value)
+    ti = __render_tar(tmp_path)
+    assert 'SOURCE_DATE_EPOCH is not valid' in capsys.readouterr().err
+    assert ti.mtime > 1700000000
+
+
+def test_tar_source_date_epoch_not_valid_strict(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', 'yesterday')
+    with pytest.raises(ValueError, match='SOURCE_DATE_EPOCH'):
+        J2subst(output_tar=str(tmp_path / 'out.tar'), strict=True)
+    assert not (tmp_path / 'out.tar').exists()
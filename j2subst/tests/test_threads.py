@@ -0,0 +1,85 @@
+import concurrent.futures
+import os
+import os.path
+
+from pathlib import Path
+
+## this module
+from j2subst import J2subst
+
+
+THREADS = 16
+ROUNDS = 8
+TEMPLATES = 24
+
+
+def __make_tree(root: Path) -> tuple[Path, list[str]]:
+    cfg = root / 'config.yml'
+    cfg.write_text('items: [ a, b, c ]\nname: test\n', encoding='utf-8')
+
+    (root / 'lib').mkdir()
+    (root / 'lib' / 'macros.j2').write_text('{%- macro kv(k, v) %}{{ k }} = {{ v | tojson }}{% endmacro -%}\n', encoding='utf-8')
+
+    names: list[str] = []
+    for i in range(TEMPLATES):
+        f = root / f't{i}.txt.j2'
+        f.write_text(
+            '{%- import "lib/macros.j2" as m -%}\n'
+            '{{ m.kv("name", cfg.name) }}\n'
+            '{{ m.kv("index", ' + str(i) + ') }}\n'
+            '{{ m.kv("request", request_id) }}\n'
+            '{%- for x in cfg["items"] %}\n{{ x | upper }}{{ loop.index }}{% endfor %}\n',
+            encoding='utf-8',
+        )
+        names.append(str(f))
+    return cfg, names
+
+
+def test_threaded_render_matches_single_threaded(tmp_path: Path):
+    cfg, names = __make_tree(tmp_path)
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        j = J2subst(config_path=[str(cfg)])
+
+        def _render(name: str, request_id: int) -> str:
+            text, _ = j.render_from_file(name, options=j.render_options(context={'request_id': request_id}))
+            return text
+
+        jobs = [ (name, r) for r in range(ROUNDS) for name in names ]
+        expected = { (name, r): _render(name, r) for name, r in jobs }
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=THREADS) as pool:
+            futures = { pool.submit(_render, name, r): (name, r) for name, r in jobs }
+            actual = { futures[f]: f.result() for f in concurrent.futures.as_completed(futures) }
+    finally:
+        os.chdir(cwd)
+
+    assert actual == expected
+    for (name, r), text in actual.items():
+        assert f'request = {r}' in text
+        assert f'index = {names.index(name)}' in text
+
+
+def test_threaded_render_file_matches_single_threaded(tmp_path: Path):
+    cfg, names = __make_tree(tmp_path)
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        j = J2subst(config_path=[str(cfg)])
+        opts = j.render_options(force=True, allow_stdin_stdout=False, context={'request_id': 0})
+
+        for name in names:
+            assert j.render_file(name, options=opts)
+        expected = { name: Path(os.path.splitext(name)[0]).read_text(encoding='utf-8') for name in names }
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=THREADS) as pool:
+            results = list(pool.map(lambda name: j.render_file(name, options=opts), names * ROUNDS))
+        actual = { name: Path(os.path.splitext(name)[0]).read_text(encoding='utf-8') for name in names }
+    finally:
+        os.chdir(cwd)
+
+    assert all(results)
+    assert actual == expected
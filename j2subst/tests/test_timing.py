@@ -0,0 +1,36 @@
+import json
+
+from pathlib import Path
+
+import pytest
+
+## this module
+from j2subst import J2subst
+
+
+@pytest.mark.parametrize('content', [ '{"durations": {"a.txt.j2": 1.', 'not json', '[]', b'\xff\xfe' ])
+def test_corrupt_timing_history(tmp_path: Path, content: str | bytes, capsys: pytest.CaptureFixture[str]):
+    history = tmp_path / 'timing.json'
+    if isinstance(content, bytes):
+        history.write_bytes(content)
+    else:
+        history.write_text(content, encoding='utf-8')
+
+    j = J2subst(timing_history=str(history), shard_costs=str(history))
+    assert 'unable to read timing history' in capsys.readouterr().err
+    assert j.timing is not None
+    assert not j.timing.durations
+    assert (j.shard_costs is not None) and not j.shard_costs.durations
+
+    ## history is rewritten from scratch
+    j.timing.record('a.txt.j2', 2.0)
+    j.timing.save()
+    assert json.loads(history.read_text(encoding='utf-8')) == { 'durations': { 'a.txt.j2': 2.0 } }
+
+
+def test_corrupt_timing_history_strict(tmp_path: Path):
+    history = tmp_path / 'timing.json'
+    history.write_text('not json', encoding='utf-8')
+
+    with pytest.raises(ValueError, match='unable to read timing history'):
+        J2subst(timing_history=str(history), strict=True)
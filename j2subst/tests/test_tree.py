@@ -0,0 +1,41 @@
+import json
+import os
+
+from pathlib import Path
+
+## this module
+from j2subst import J2subst
+
+
+## Kubernetes-style volume: visible names are symlinks into "..data" which points to snapshot directory
+def __make_volume(root: Path, snapshot: str, values: dict[str, dict[str, str]]):
+    snap = root / snapshot
+    for d, files in values.items():
+        (snap / d).mkdir(parents=True)
+        for name, value in files.items():
+            (snap / d / name).write_text(value, encoding='utf-8')
+
+    tmp = root / '..data_tmp'
+    os.symlink(snapshot, tmp)
+    os.replace(tmp, root / '..data')
+    for d in values:
+        if not (root / d).is_symlink():
+            os.symlink(os.path.join('..data', d), root / d)
+
+
+def test_config_tree_tojson(tmp_path: Path):
+    vol = tmp_path / 'vol'
+    vol.mkdir()
+    __make_volume(vol, '..2026_01_01', { 'db': { 'host': 'db1', 'port': '5432' } })
+
+    j = J2subst(config_tree={ 'app': str(vol) })
+    text, _ = j.render_str('{{ cfg.app | tojson }}|{{ cfg.app.db | tojson }}')
+    whole, sub = text.split('|')
+    assert json.loads(whole) == { 'db': { 'host': 'db1', 'port': '5432' } }
+    assert json.loads(sub) == { 'host': 'db1', 'port': '5432' }
+
+    __make_volume(vol, '..2026_01_02', { 'db': { 'host': 'db2', 'port': '5432' } })
+    for t in j.config_trees:
+        t.refresh()
+    text, _ = j.render_str('{{ cfg.app.db | tojson }}')
+    assert json.loads(text) == { 'host': 'db2', 'port': '5432' }
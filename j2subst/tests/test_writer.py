@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+from pathlib import Path
+
+## this module
+from j2subst import J2subst
+
+
+def test_output_safety(tmp_path: Path):
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        Path('a.txt.j2').write_text('{{ 1 + 1 }}\n', encoding='utf-8')
+        j = J2subst()
+
+        assert j.render_file('a.txt.j2', options=j.render_options(allow_stdin_stdout=False))
+        assert Path('a.txt').read_text(encoding='utf-8') == '2'
+        ## no overwrite without "force"
+        assert not j.render_file('a.txt.j2', options=j.render_options(allow_stdin_stdout=False))
+        assert j.render_file('a.txt.j2', options=j.render_options(allow_stdin_stdout=False, force=True))
+
+        os.symlink('a.txt', 'b.txt')
+        assert not j.render_file('a.txt.j2', 'b.txt', options=j.render_options(allow_stdin_stdout=False, force=True))
+        os.mkdir('c.txt')
+        assert not j.render_file('a.txt.j2', 'c.txt', options=j.render_options(allow_stdin_stdout=False, force=True))
+        assert not j.render_file('a.txt.j2', 'a.txt.j2', options=j.render_options(allow_stdin_stdout=False, force=True))
+
+        j.sync_outputs()
+        ## no temporary files are left
+        assert sorted(os.listdir('.')) == [ 'a.txt', 'a.txt.j2', 'b.txt', 'c.txt' ]
+    finally:
+        os.chdir(cwd)
+
+
+## output file which is the same file as (redirected) stdout is treated as stdout
+def test_output_redirected_stdout(tmp_path: Path):
+    f = tmp_path / 'a.txt.j2'
+    f.write_text('{{ 1 + 1 }}\n', encoding='utf-8')
+    out = tmp_path / 'out.txt'
+
+    code = 'import sys; from j2subst import J2subst; j = J2subst(); sys.exit(0 if j.render_file(sys.argv[1], sys.argv[2]) else 1)'
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    with open(out, mode='w', encoding='utf-8') as f_out:
+        r = subprocess.run([ sys.executable, '-c', code, str(f), str(out) ], stdout=f_out, env=env, check=False)
+
+    assert r.returncode == 0
+    assert out.read_text(encoding='utf-8') == '2'
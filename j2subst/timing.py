@@ -0,0 +1,77 @@
+import json
+import os
+import os.path
+import threading
+
+from collections.abc import (
+    Mapping,
+)
+from os import (
+    PathLike,
+)
+
+## this module
+from .writer import write_file_atomic
+
+
+## weight of the latest measurement (exponential moving average)
+J2SUBST_TIMING_ALPHA = 0.5
+
+
+## per-template render durations (in seconds) keyed by template path relative to current working directory
+class J2substTimingHistory:
+
+    def __init__(self, path: str | PathLike[str]):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.durations: dict[str, float] = {}
+        self.changed = False
+
+    ## raises OSError/ValueError if file is not readable or not valid (history is kept empty then)
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+
+        with open(self.path, mode='r', encoding='utf-8') as f:
+            x = json.load(f)
+        if not (isinstance(x, dict) and isinstance(x.get('durations'), dict)):
+            raise ValueError('"durations" mapping is not found')
+        durations = { str(k): float(v) for k, v in x['durations'].items() if isinstance(v, (int, float)) }
+        with self.lock:
+            self.durations = durations
+
+    def record(self, key: str, seconds: float):
+        with self.lock:
+            prev = self.durations.get(key)
+            if prev is not None:
+                seconds = J2SUBST_TIMING_ALPHA * seconds + (1 - J2SUBST_TIMING_ALPHA) * prev
+            self.durations[key] = seconds
+            self.changed = True
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            data = json.dumps({ 'durations': self.durations }, indent=2, sort_keys=True) + '\n'
+            self.changed = False
+
+        write_file_atomic(self.path, data.encode('utf-8'), None, True)
+
+    ## estimated costs of templates ("files" maps keys to file names):
+    ## recorded durations or (if missing) file size scaled by average duration per byte
+    def estimate(self, files: Mapping[str, str]) -> dict[str, float]:
+        sizes: dict[str, int] = {}
+        for k, f in files.items():
+            try:
+                sizes[k] = max(1, os.path.getsize(f))
+            except OSError:
+                sizes[k] = 1
+
+        with self.lock:
+            known = { k: self.durations[k] for k in files if k in self.durations }
+
+        rate = 1.0
+        if known:
+            rate = sum(known.values()) / sum(sizes[k] for k in known)
+
+        return { k: known.get(k, sizes[k] * rate) for k in files }
@@ -0,0 +1,164 @@
+import os
+import os.path
+import stat
+import threading
+
+from collections.abc import (
+    Iterator,
+    Mapping,
+)
+from os import (
+    PathLike,
+)
+from typing import (
+    Any,
+)
+
+
+## Kubernetes updates ConfigMap/Secret volumes by swapping this symlink
+J2SUBST_CONFIG_TREE_DATA_LINK = '..data'
+
+
+## directory tree as configuration source: directories are mappings, files are values
+##   /etc/config/db/host     -> cfg.<key>.db.host
+##   /etc/config/db/password -> cfg.<key>.db.password
+## values are read on demand and cached
+class J2substConfigTree(Mapping[str, Any]):
+
+    def __init__(self, path: str | PathLike[str]):
+        self.path = os.path.abspath(path)
+        self.lock = threading.Lock()
+
+        ## see refresh()
+        self.base = self.path
+        self.snapshot: str | None = None
+        self.generation = 0
+        ## relative path -> (inode, mtime, value)
+        self.cache: dict[str, tuple[int, int, Any]] = {}
+        ## relative path -> is directory (only for snapshots)
+        self.kinds: dict[str, bool | None] = {}
+
+        self.refresh()
+
+    def refresh(self) -> bool:
+        ## returns True if tree was changed (so cache was dropped)
+        try:
+            snapshot: str | None = os.readlink(os.path.join(self.path, J2SUBST_CONFIG_TREE_DATA_LINK))
+        except OSError:
+            snapshot = None
+
+        with self.lock:
+            if (self.generation > 0) and (snapshot == self.snapshot):
+                return False
+
+            self.snapshot = snapshot
+            ## read through snapshot directory, so values are consistent even if symlink is swapped meanwhile
+            self.base = self.path if snapshot is None else os.path.join(self.path, snapshot)
+            self.generation += 1
+            self.cache = {}
+            self.kinds = {}
+            return True
+
+    def node(self, relpath: str) -> 'J2substConfigTreeNode':
+        return J2substConfigTreeNode(self, relpath)
+
+    def read(self, relpath: str, is_dir: bool) -> Any:
+        full = os.path.join(self.base, relpath)
+
+        with self.lock:
+            x = self.cache.get(relpath)
+        if (x is not None) and (self.snapshot is not None):
+            ## fastpath: snapshot directories are never changed in place
+            return x[2]
+
+        st = os.stat(full)
+        if (x is not None) and (x[0] == st.st_ino) and (x[1] == st.st_mtime_ns):
+            return x[2]
+
+        value: Any
+        if is_dir:
+            value = sorted(e.name for e in os.scandir(full) if not e.name.startswith('.'))
+        else:
+            with open(full, mode='rb') as f:
+                value = f.read()
+            try:
+                value = value.decode('utf-8')
+            except UnicodeDecodeError:
+                ## keep binary data as is
+                pass
+
+        with self.lock:
+            self.cache[relpath] = (st.st_ino, st.st_mtime_ns, value)
+        return value
+
+    def is_dir(self, relpath: str) -> bool | None:
+        ## returns None if path is neither directory nor regular file
+        snapshot = self.snapshot
+        if snapshot is not None:
+            with self.lock:
+                if relpath in self.kinds:
+                    return self.kinds[relpath]
+
+        kind: bool | None = None
+        try:
+            st = os.stat(os.path.join(self.base, relpath))
+            if stat.S_ISDIR(st.st_mode):
+                kind = True
+            elif stat.S_ISREG(st.st_mode):
+                kind = False
+        except OSError:
+            pass
+
+        if snapshot is not None:
+            with self.lock:
+                self.kinds[relpath] = kind
+        return kind
+
+    ## root node
+    def __getitem__(self, key: str) -> Any:
+        return self.node('')[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.node(''))
+
+    def __len__(self) -> int:
+        return len(self.node(''))
+
+    def __repr__(self) -> str:
+        return repr(self.node(''))
+
+
+class J2substConfigTreeNode(Mapping[str, Any]):
+
+    def __init__(self, tree: J2substConfigTree, relpath: str):
+        self.tree = tree
+        self.relpath = relpath
+
+    def __child(self, key: object) -> str:
+        if (not isinstance(key, str)) or (not key) or key.startswith('.') or ('/' in key):
+            raise KeyError(key)
+        return os.path.join(self.relpath, key)
+
+    def __getitem__(self, key: str) -> Any:
+        child = self.__child(key)
+        is_dir = self.tree.is_dir(child)
+        if is_dir is None:
+            raise KeyError(key)
+        if is_dir:
+            return self.tree.node(child)
+        return self.tree.read(child, False)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            return self.tree.is_dir(self.__child(key)) is not None
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tree.read(self.relpath, True))
+
+    def __len__(self) -> int:
+        return len(self.tree.read(self.relpath, True))
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
@@ -0,0 +1,147 @@
+import itertools
+import os
+import os.path
+import stat
+
+from collections.abc import (
+    Callable,
+    Iterable,
+)
+
+
+class J2substOutputError(ValueError):
+    pass
+
+
+__j2subst_tmp_counter = itertools.count()
+
+
+def __tmp_name(name: str) -> str:
+    return f'.{name}.{os.getpid()}.{next(__j2subst_tmp_counter)}.j2subst'
+
+
+def __write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+
+def __copy_all(fd_out: int, fd_in: int, count: int):
+    ## zero-copy (in-kernel) copy if possible
+    while count > 0:
+        try:
+            n = os.copy_file_range(fd_in, fd_out, count)
+        except OSError:
+            break
+        if n == 0:
+            ## source file was truncated meanwhile
+            return
+        count -= n
+
+    while count > 0:
+        try:
+            n = os.sendfile(fd_out, fd_in, None, count)
+        except OSError:
+            break
+        if n == 0:
+            return
+        count -= n
+
+    while count > 0:
+        data = os.read(fd_in, min(count, 1 << 20))
+        if not data:
+            return
+        __write_all(fd_out, data)
+        count -= len(data)
+
+
+def __samefile(f_in: str | None, st: os.stat_result) -> bool:
+    if not f_in:
+        return False
+    try:
+        st_in = os.stat(f_in)
+    except OSError:
+        return False
+    return (st_in.st_dev == st.st_dev) and (st_in.st_ino == st.st_ino)
+
+
+## raises J2substOutputError if existing output file can't be replaced
+def __verify_existing(f_out: str, f_in: str | None, st: os.stat_result, force: bool):
+    if stat.S_ISLNK(st.st_mode):
+        raise J2substOutputError(f'output file is symlink: {f_out}')
+    if not stat.S_ISREG(st.st_mode):
+        raise J2substOutputError(f'output file is not a file: {f_out}')
+    if __samefile(f_in, st):
+        raise J2substOutputError(f'unable to process template inplace: {f_in}')
+    if not force:
+        raise J2substOutputError(f'unable to overwrite existing file: {f_out}')
+
+
+## write output file atomically: data goes to temporary file which is then renamed into place.
+## all operations are relative to directory fd and never follow symlinks.
+## without "force", output file is created only if it doesn't exist.
+def write_file_atomic(f_out: str, data: bytes, f_in: str | None = None, force: bool = False):
+    __replace_atomic(f_out, f_in, force, lambda fd: __write_all(fd, data))
+
+
+## same as write_file_atomic() but data is written in chunks (e.g. streamed)
+def write_chunks_atomic(f_out: str, chunks: Iterable[bytes], f_in: str | None = None, force: bool = False):
+
+    def __write_chunks(fd: int):
+        for c in chunks:
+            __write_all(fd, c)
+
+    __replace_atomic(f_out, f_in, force, __write_chunks)
+
+
+## same as write_file_atomic() but data is copied from file "f_in" (except last "tail" bytes)
+def copy_file_atomic(f_out: str, f_in: str, force: bool = False, tail: int = 0):
+    fd_in = os.open(f_in, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        count = max(0, os.fstat(fd_in).st_size - tail)
+        __replace_atomic(f_out, f_in, force, lambda fd: __copy_all(fd, fd_in, count))
+    finally:
+        os.close(fd_in)
+
+
+def __replace_atomic(f_out: str, f_in: str | None, force: bool, fill: Callable[[int], None]):
+    d_name, name = os.path.split(f_out)
+    if not name:
+        raise J2substOutputError(f'not valid output file name: {f_out}')
+
+    d_fd = os.open(d_name or '.', os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+    try:
+        try:
+            st = os.stat(name, dir_fd=d_fd, follow_symlinks=False)
+        except FileNotFoundError:
+            pass
+        else:
+            __verify_existing(f_out, f_in, st, force)
+
+        ## NB: there's TOCTOU window between check above and rename() below (without "force")
+        tmp = __tmp_name(name)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW | os.O_CLOEXEC, 0o666, dir_fd=d_fd)
+        try:
+            try:
+                fill(fd)
+            finally:
+                os.close(fd)
+            os.rename(tmp, name, src_dir_fd=d_fd, dst_dir_fd=d_fd)
+        except BaseException:
+            try:
+                os.unlink(tmp, dir_fd=d_fd)
+            except OSError:
+                pass
+            raise
+    finally:
+        os.close(d_fd)
+
+
+## flush file (or directory) to disk
+def fsync_path(path: str, directory: bool = False):
+    fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC | (os.O_DIRECTORY if directory else 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)